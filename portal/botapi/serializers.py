@@ -6,7 +6,8 @@ from newsapp.models import News
 class NewsSerializer(serializers.ModelSerializer):
     class Meta:
         model = News
-        fields = ['id', 'title', 'author', 'content', 'category', 'image_url', 'telegram_author']
+        fields = ['id', 'title', 'author', 'content', 'category', 'image_url', 'telegram_author', 'duplicate_of']
+        read_only_fields = ['duplicate_of']
 
     def create(self, validated_data):
         validated_data['moderation_status'] = 'pending'
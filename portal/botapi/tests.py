@@ -79,4 +79,30 @@ class NewsAPITestCase(TestCase):
         response = self.client.get(self.check_url.format(99999))
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertIn('error', response.data)
\ No newline at end of file
+        self.assertIn('error', response.data)
+
+    # Test 5: Перепечатка опубликованной новости помечается дублем
+    def test_create_news_near_duplicate(self):
+        """Тест пометки почти-дубля при создании новости"""
+        text = (
+            'С понедельника в городе запускают три новых автобусных маршрута. Они свяжут спальные районы '
+            'с центром и станциями метро, интервал движения в час пик составит восемь минут, а вечером '
+            'автобусы будут ходить до полуночи.'
+        )
+        original = News.objects.create(title='Новые маршруты', content=text, moderation_status='approved')
+        data = {
+            'title': 'Автобусы пойдут по-новому',
+            'content': text.replace('до полуночи', 'до самой полуночи'),
+            'telegram_user_id': 123456789,
+            'telegram_username': 'test_user',
+        }
+
+        response = self.client.post(
+            self.create_url,
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['duplicate_of'], original.id)
+        self.assertEqual(News.objects.get(id=response.data['id']).duplicate_of, original)
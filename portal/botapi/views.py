@@ -31,7 +31,10 @@ class NewsCreateAPIView(APIView):
 
         serializer = NewsSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
+            news = serializer.save()
+            # Перепечатку уже опубликованной статьи помечаем для модератора
+            if news.mark_near_duplicate():
+                logger.info(f"Новость {news.id} похожа на новость {news.duplicate_of_id}")
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         logger.info(f"новость не прошла проверку сериалайзера {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
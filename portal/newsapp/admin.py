@@ -1,22 +1,36 @@
 from django.contrib import admin
-from django.utils import timezone
 
-from .models import News, Category, Comments, TG_Author
+from .models import News, Category, Comments, ExchangeRate, NewsSource, TG_Author
+
+
+class DuplicateFilter(admin.SimpleListFilter):
+    title = 'Почти-дубль'
+    parameter_name = 'duplicate'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Да'), ('no', 'Нет')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(duplicate_of__isnull=False)
+        if self.value() == 'no':
+            return queryset.filter(duplicate_of__isnull=True)
+        return queryset
 
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
-    list_display = ('title', 'category', 'moderation_status', 'author' , 'telegram_author', 'date_created', 'views', 'image_url')
-    actions = ['approve_selected', 'rejected_selected']
-    list_filter = ('moderation_status', 'category',)
+    list_display = ('title', 'category', 'moderation_status', 'author' , 'telegram_author', 'date_created', 'views', 'image_url', 'duplicate_of')
+    actions = ['approve_selected', 'rejected_selected', 'find_duplicates_selected']
+    list_filter = ('moderation_status', 'category', DuplicateFilter)
+    list_select_related = ('category', 'telegram_author', 'duplicate_of')
+    # Счетчики обновляются только UPDATE-ами в БД, сохранение формы их не пишет
+    readonly_fields = ('views', 'comments_count', 'duplicate_of')
     search_fields = ('title',)
 
     def approve_selected(self, request, queryset):
         for news in queryset:
-            news.moderation_status = 'approved'
-            news.moderated_by = request.user
-            news.moderation_date = timezone.now()
-            news.save()
+            news.approve(request.user)
 
         self.message_user(
             request,
@@ -26,10 +40,7 @@ class NewsAdmin(admin.ModelAdmin):
 
     def rejected_selected(self, request, queryset):
         for news in queryset:
-            news.moderation_status = 'rejected'
-            news.moderated_by = request.user
-            news.moderation_date = timezone.now()
-            news.save()
+            news.reject(request.user)
 
         self.message_user(
             request,
@@ -38,6 +49,19 @@ class NewsAdmin(admin.ModelAdmin):
 
     rejected_selected.short_description = "Отклонить выбранные новости"
 
+    def find_duplicates_selected(self, request, queryset):
+        found = 0
+        for news in queryset.select_related(None).only('id', 'minhash', 'lsh_buckets', 'duplicate_of'):
+            if news.mark_near_duplicate():
+                found += 1
+
+        self.message_user(
+            request,
+            f"Найдено почти-дублей: {found} из {queryset.count()}."
+        )
+
+    find_duplicates_selected.short_description = "Найти почти-дубли среди выбранных"
+
 
 @admin.register(TG_Author)
 class TG_AuthorAdmin(admin.ModelAdmin):
@@ -49,6 +73,21 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
 
+@admin.register(NewsSource)
+class NewsSourceAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'url', 'category', 'fetch_mode', 'priority', 'poll_interval', 'publish_rate', 'enabled',
+        'last_polled_at', 'next_poll_at'
+    )
+    list_editable = ('priority', 'poll_interval', 'enabled')
+    list_filter = ('enabled', 'fetch_mode', 'category')
+    search_fields = ('name', 'url')
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'scale', 'rate', 'date', 'updated_at')
+    search_fields = ('currency',)
+
 @admin.register(Comments)
 class CommentsAdmin(admin.ModelAdmin):
     list_display = ('comments', 'author')
\ No newline at end of file
@@ -1,9 +1,9 @@
-# from django.apps import AppConfig
-#
-#
-# class NewsappConfig(AppConfig):
-#     default_auto_field = 'django.db.models.BigAutoField'
-#     name = 'newsapp'
-#
-#     def ready(self):
-#         import newsapp.signals
+from django.apps import AppConfig
+
+
+class NewsappConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'newsapp'
+
+    def ready(self):
+        import newsapp.signals
@@ -0,0 +1,141 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+
+logger = logging.getLogger('app')
+
+
+def create_driver():
+    # Selenium импортируем лениво: для обычных источников браузер не нужен
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    # Не ждем картинки и стили: нужные элементы ищем явным ожиданием
+    options.page_load_strategy = 'eager'
+    return webdriver.Chrome(options=options)
+
+
+def driver_alive(driver):
+    # Любая команда WebDriver падает, если сессия или сам Chrome умерли
+    try:
+        driver.current_url
+    except Exception:
+        return False
+    return True
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """
+    Ограниченный пул WebDriver, общий для всех источников и запусков задачи
+    в процессе воркера. Браузер пересоздается после max_pages страниц или если
+    после ошибки его сессия не отвечает. Ошибки страницы (не дождались элемента,
+    не разобрали) браузер не закрывают: холодный старт дороже
+    """
+
+    def __init__(self, size, max_pages, factory=create_driver, probe=driver_alive):
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+        self.probe = probe
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def browser(self, timeout=None):
+        item = self._acquire(timeout)
+        broken = False
+        try:
+            yield item.driver
+        except Exception:
+            broken = not self.probe(item.driver)
+            raise
+        finally:
+            item.pages += 1
+            self._release(item, broken)
+
+    def _acquire(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Нет свободного браузера в пуле")
+                self._cond.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        # Запуск браузера долгий, поэтому делаем его вне блокировки
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        logger.info("Запущен новый браузер для парсинга")
+        return PooledDriver(driver)
+
+    def _release(self, item, broken):
+        if broken or item.pages >= self.max_pages:
+            self._quit(item)
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(item)
+            self._cond.notify()
+
+    def _quit(self, item):
+        try:
+            item.driver.quit()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии браузера: {e}")
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            self._quit(item)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=settings.NEWS_BROWSER_POOL_SIZE,
+                max_pages=settings.NEWS_BROWSER_MAX_PAGES,
+            )
+            atexit.register(_pool.close)
+        return _pool
+
+
+@worker_process_shutdown.connect
+def close_pool(**kwargs):
+    # Дочерние процессы prefork завершаются без atexit, браузеры закрываем явно
+    if _pool is not None:
+        _pool.close()
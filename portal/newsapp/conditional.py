@@ -0,0 +1,54 @@
+import hashlib
+
+from .page_cache import LIST_VERSION_KEY, detail_version_key, get_versions
+from .services import NewsService
+
+# Валидаторы для django.views.decorators.http.condition: считаются до рендера шаблона,
+# чтобы на совпавший If-None-Match / If-Modified-Since сразу ответить 304
+
+
+def _user_key(request):
+    return request.user.pk if request.user.is_authenticated else 'anon'
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def list_etag(request, **kwargs):
+    # Поколение ленты меняется при любой правке новостей, категорий и данных виджетов
+    version, = get_versions([LIST_VERSION_KEY])
+    return _etag(version, _user_key(request), request.get_full_path())
+
+
+def list_last_modified(request, **kwargs):
+    return NewsService.list_last_modified()
+
+
+def _detail_validators(request, pk):
+    # condition вызывает обе функции, запрос к БД делаем один раз
+    if not hasattr(request, 'news_validators'):
+        request.news_validators = NewsService.detail_validators(pk)
+    return request.news_validators
+
+
+def detail_etag(request, pk):
+    validators = _detail_validators(request, pk)
+    if validators is None:
+        return None
+    version, = get_versions([detail_version_key(pk)])
+    return _etag(
+        version,
+        _user_key(request),
+        validators['date_created'].isoformat(),
+        validators['moderation_date'],
+        validators['comments_count'],
+    )
+
+
+def detail_last_modified(request, pk):
+    validators = _detail_validators(request, pk)
+    if validators is None:
+        return None
+    dates = [validators['date_created'], validators['moderation_date'], validators['last_comment']]
+    return max(date for date in dates if date)
@@ -0,0 +1,187 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import CurrencyRate, CurrencyRollup, ExchangeRate
+from .page_cache import bump_version, get_versions
+
+# Кросс-курсы лежат в Redis одной таблицей и копируются в память процесса;
+# новая версия означает, что копию пора перечитать
+MATRIX_KEY = 'currency_rates:matrix'
+MATRIX_VERSION_KEY = 'currency_rates:version'
+BASE_CURRENCY = 'BYN'
+
+PERIODS = ('day', 'week')
+# Диапазоны графика: из какой свертки строится ряд и сколько дней он охватывает
+SERIES_RANGES = {
+    '1m': ('day', 31),
+    '3m': ('day', 92),
+    '1y': ('week', 366),
+    '5y': ('week', 5 * 366),
+}
+
+
+def series_key(currency, range_name):
+    return f'currency_series:{currency}:{range_name}'
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def record_samples(rows, previous):
+    """
+    Пишет в историю курсы из rows (ExchangeRate), которые отличаются от previous
+    {валюта: (дата курса, курс за единицу)}: изменившиеся и установленные на новую дату,
+    даже если курс тот же — иначе у дней без изменений не было бы дневной свертки.
+    Возвращает записанные CurrencyRate
+    """
+    samples = [
+        CurrencyRate(currency=row.currency, ts=row.updated_at, date=row.date, rate=row.rate / row.scale)
+        for row in rows
+        if previous.get(row.currency) != (row.date, row.rate / row.scale)
+    ]
+    CurrencyRate.objects.bulk_create(samples)
+    return samples
+
+
+def update_rollups(samples):
+    """Дополняет дневные и недельные свертки новыми курсами: одна выборка и один upsert"""
+    if not samples:
+        return
+    keys = {
+        (sample.currency, period, period_start(period, sample.date))
+        for sample in samples for period in PERIODS
+    }
+    rollups = {
+        (rollup.currency, rollup.period, rollup.start): rollup
+        for rollup in CurrencyRollup.objects.filter(
+            currency__in={currency for currency, _, _ in keys},
+            start__in={start for _, _, start in keys},
+        )
+    }
+    for sample in sorted(samples, key=lambda sample: sample.ts):
+        for period in PERIODS:
+            key = (sample.currency, period, period_start(period, sample.date))
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = CurrencyRollup(
+                    currency=sample.currency, period=period, start=key[2],
+                    open=sample.rate, high=sample.rate, low=sample.rate, close=sample.rate
+                )
+            rollup.high = max(rollup.high, sample.rate)
+            rollup.low = min(rollup.low, sample.rate)
+            rollup.close = sample.rate
+            rollup.samples += 1
+    CurrencyRollup.objects.bulk_create(
+        [rollups[key] for key in keys],
+        update_conflicts=True,
+        unique_fields=['currency', 'period', 'start'],
+        update_fields=['high', 'low', 'close', 'samples']
+    )
+
+
+def build_series(currencies, today=None):
+    """
+    Ряды для всех диапазонов SERIES_RANGES по сверткам: один запрос на период.
+    Возвращает {series_key: {'currency', 'range', 'period', 'points': [[дата, курс], ...]}}
+    """
+    today = today or timezone.localdate()
+    series = {}
+    for period in PERIODS:
+        ranges = {name: days for name, (range_period, days) in SERIES_RANGES.items() if range_period == period}
+        since = period_start(period, today - datetime.timedelta(days=max(ranges.values())))
+        points = {currency: [] for currency in currencies}
+        for currency, start, close in CurrencyRollup.objects.filter(
+            currency__in=currencies, period=period, start__gte=since
+        ).order_by('currency', 'start').values_list('currency', 'start', 'close'):
+            points[currency].append((start, close))
+        for currency in currencies:
+            for name, days in ranges.items():
+                cutoff = period_start(period, today - datetime.timedelta(days=days))
+                series[series_key(currency, name)] = {
+                    'currency': currency,
+                    'range': name,
+                    'period': period,
+                    'points': [[start.isoformat(), close] for start, close in points[currency] if start >= cutoff],
+                }
+    return series
+
+
+def cache_series(currencies):
+    series = build_series(sorted(currencies))
+    cache.set_many(series, timeout=settings.NEWS_RATES_SERIES_TIMEOUT)
+    return series
+
+
+def get_series(currency, range_name):
+    # Ряды пересчитываются при каждом новом курсе; здесь — только холодный кеш
+    series = cache.get(series_key(currency, range_name))
+    if series is None:
+        series = cache_series([currency])[series_key(currency, range_name)]
+    return series
+
+
+class RateMatrix:
+    """
+    Кросс-курсы всех валют НБРБ и BYN: rates[i][j] — сколько валюты j дают за
+    единицу валюты i. Считается один раз на обновление курсов, дальше только чтение
+    """
+
+    def __init__(self, per_unit):
+        # per_unit — {валюта: BYN за 1 единицу}
+        self.currencies = tuple(sorted({BASE_CURRENCY, *per_unit}))
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        byn = [1.0 if currency == BASE_CURRENCY else per_unit[currency] for currency in self.currencies]
+        self.rates = [[source / target for target in byn] for source in byn]
+
+    @classmethod
+    def from_rates(cls, rows):
+        return cls({row.currency: row.rate / row.scale for row in rows})
+
+    def rate(self, source, target):
+        try:
+            return self.rates[self.index[source]][self.index[target]]
+        except KeyError as e:
+            raise ValueError(f"Неизвестная валюта: {e.args[0]}")
+
+    def convert(self, amount, source, target):
+        return amount * self.rate(source, target)
+
+
+def publish_matrix(rows):
+    matrix = RateMatrix.from_rates(rows)
+    cache.set(MATRIX_KEY, matrix, timeout=None)
+    bump_version(MATRIX_VERSION_KEY)
+    return matrix
+
+
+_matrix = None
+_matrix_version = None
+_checked_at = float('-inf')
+
+
+def get_matrix():
+    """
+    Таблица кросс-курсов из памяти процесса. Версию в Redis проверяем не чаще раза
+    в NEWS_RATES_MATRIX_CHECK_INTERVAL секунд, саму таблицу читаем только при новой версии
+    """
+    global _matrix, _matrix_version, _checked_at
+    now = time.monotonic()
+    if _matrix is not None and now - _checked_at < settings.NEWS_RATES_MATRIX_CHECK_INTERVAL:
+        return _matrix
+    version, = get_versions([MATRIX_VERSION_KEY])
+    if _matrix is None or version != _matrix_version:
+        matrix = cache.get(MATRIX_KEY)
+        if matrix is None:
+            # Redis сброшен: таблицу собираем из последних сохраненных курсов
+            matrix = RateMatrix.from_rates(ExchangeRate.objects.all())
+            cache.set(MATRIX_KEY, matrix, timeout=None)
+        _matrix, _matrix_version = matrix, version
+    _checked_at = now
+    return _matrix
@@ -0,0 +1,92 @@
+import hashlib
+import random
+import re
+
+from django.conf import settings
+
+# MinHash по словесным триграммам. Сигнатура режется на LSH_BANDS полос по
+# LSH_ROWS значений: тексты с похожестью по Жаккару ~0.8 почти наверняка
+# совпадут хотя бы в одной полосе, а случайные — почти никогда
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# Фиксированное зерно: сигнатуры должны совпадать между процессами и релизами
+_rng = random.Random(20240518)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text):
+    words = WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+    if len(words) < settings.NEWS_DUPLICATE_MIN_WORDS:
+        # Слишком короткие тексты совпадают случайно, их не сравниваем
+        return set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=4).digest(), 'little')
+
+
+def minhash(text):
+    hashes = [_hash(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return [
+        min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+        for a, b in PERMUTATIONS
+    ]
+
+
+def lsh_buckets(signature):
+    if not signature:
+        return None
+    buckets = []
+    for band in range(LSH_BANDS):
+        values = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        key = f'{band}:' + ','.join(map(str, values))
+        buckets.append(int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little', signed=True))
+    return buckets
+
+
+def similarity(first, second):
+    # Доля совпавших минимумов оценивает похожесть по Жаккару
+    if not first or not second:
+        return 0.0
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def best_match(signature, buckets, candidates):
+    """
+    candidates — (pk, minhash, lsh_buckets, duplicate_of_id). Возвращает pk оригинала
+    самого похожего кандидата не ниже NEWS_DUPLICATE_THRESHOLD или None
+    """
+    if not signature:
+        return None
+    buckets = set(buckets)
+    best, best_score = None, settings.NEWS_DUPLICATE_THRESHOLD
+    for pk, other, other_buckets, duplicate_of_id in candidates:
+        if not buckets.intersection(other_buckets or ()):
+            continue
+        score = similarity(signature, other)
+        if score >= best_score:
+            # Дубль дубля указывает на первоисточник
+            best, best_score = duplicate_of_id or pk, score
+    return best
+
+
+def candidates_for(queryset, buckets):
+    # Перекрытие массивов (&&) идет по GIN-индексу news_lsh_buckets_gin
+    if not buckets:
+        return []
+    return list(queryset.filter(lsh_buckets__overlap=list(buckets)).values_list(
+        'pk', 'minhash', 'lsh_buckets', 'duplicate_of_id'
+    ))
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import socket
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import NewsImage
+from .scraper import HTTP_HEADERS, HTTP_TIMEOUT
+
+logger = logging.getLogger('app')
+
+IMAGES_DIR = 'news_images'
+MAX_REDIRECTS = 5
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def check_public_url(url):
+    """
+    Пускает только http(s) на публичные адреса: image_url приходит от пользователей,
+    и без проверки воркер ходил бы по их ссылкам во внутреннюю сеть
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f"Недопустимый адрес картинки: {url}")
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port or 443, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise requests.ConnectionError(f"Не удалось разрешить {parts.hostname}: {e}")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        address = getattr(address, 'ipv4_mapped', None) or address
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Адрес картинки ведет во внутреннюю сеть: {url}")
+
+
+def load_image_bytes(image_url):
+    """Читает картинку из MEDIA_ROOT (фото из бота) или скачивает по внешнему URL"""
+    if image_url.startswith(settings.MEDIA_URL):
+        name = image_url[len(settings.MEDIA_URL):]
+        with default_storage.open(name, 'rb') as file:
+            return file.read()
+
+    # Редиректы проходим сами: каждый следующий адрес проверяется так же, как исходный
+    url = image_url
+    for _ in range(MAX_REDIRECTS + 1):
+        check_public_url(url)
+        response = requests.get(url, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, stream=True, allow_redirects=False)
+        if not response.is_redirect:
+            break
+        response.close()
+        url = urljoin(url, response.headers['Location'])
+    else:
+        raise ValueError(f"Слишком много редиректов: {image_url}")
+
+    with response:
+        response.raise_for_status()
+        data = io.BytesIO()
+        for chunk in response.iter_content(64 * 1024):
+            data.write(chunk)
+            if data.tell() > settings.NEWS_IMAGE_MAX_BYTES:
+                raise ValueError(f"Картинка больше {settings.NEWS_IMAGE_MAX_BYTES} байт: {image_url}")
+        return data.getvalue()
+
+
+def variant_name(content_hash, width, ext):
+    return os.path.join(IMAGES_DIR, content_hash[:2], f'{content_hash}-{width}.{ext}')
+
+
+def build_variants(data, content_hash):
+    """
+    Сохраняет WebP и JPEG для каждой ширины из NEWS_IMAGE_WIDTHS, не больше исходной.
+    Имена по хэшу содержимого, поэтому уже сохраненные файлы не пережимаются
+    """
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        # У JPEG нет прозрачности: подкладываем белый фон
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    image = image.convert('RGB')
+
+    widths = [width for width in settings.NEWS_IMAGE_WIDTHS if width < image.width] or [image.width]
+    variants = {fmt: [] for fmt in FORMATS}
+    for width in widths:
+        resized = image
+        if width != image.width:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+        for fmt, (pil_format, ext) in FORMATS.items():
+            name = variant_name(content_hash, width, ext)
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, quality=settings.NEWS_IMAGE_QUALITY, optimize=True)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants[fmt].append([width, name])
+    return image.width, image.height, variants
+
+
+def ingest_image(image_url):
+    """Возвращает NewsImage для адреса; картинка скачивается и пережимается один раз"""
+    image = NewsImage.objects.filter(source_url=image_url).first()
+    if image is not None:
+        return image
+
+    data = load_image_bytes(image_url)
+    content_hash = hashlib.sha256(data).hexdigest()
+    # Та же картинка по другому адресу: варианты уже есть, заново не пережимаем
+    same = NewsImage.objects.filter(content_hash=content_hash).first()
+    if same is not None:
+        width, height, variants = same.width, same.height, same.variants
+    else:
+        width, height, variants = build_variants(data, content_hash)
+        logger.info(f"Картинка пережата в {sum(len(v) for v in variants.values())} вариантов: {image_url}")
+
+    image, created = NewsImage.objects.get_or_create(source_url=image_url, defaults={
+        'content_hash': content_hash,
+        'width': width,
+        'height': height,
+        'variants': variants,
+    })
+    return image
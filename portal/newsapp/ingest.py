@@ -0,0 +1,185 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils.text import Truncator
+
+from .fingerprint import best_match, candidates_for
+from .models import News, NEWS_SEARCH_VECTOR
+from .page_cache import LIST_VERSION_KEY, bump_version
+from .scraper import (
+    fetch_article, fetch_listing, is_permanent_error, known_broken, remember_broken, remember_pages
+)
+
+logger = logging.getLogger('app')
+
+TITLE_MAX_LENGTH = News._meta.get_field('title').max_length
+
+
+def _map(executor, func, calls):
+    # Ошибка одного вызова возвращается вместе с результатами остальных
+    futures = [executor.submit(func, *args) for args in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append((future.result(), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def build_news(article, source):
+    news = News(
+        title=Truncator(article.title).chars(TITLE_MAX_LENGTH),
+        image_url=article.image_url,
+        content=article.content,
+        category_id=source.category_id,
+        source_url=article.url,
+        moderation_status='approved',
+    )
+    # bulk_create не вызывает save(), анонс и сигнатуру заполняем сами
+    news.fill_excerpt()
+    news.fill_fingerprint()
+    return news
+
+
+def drop_near_duplicates(news):
+    """
+    Отсеивает перепечатки уже сохраненных статей и друг друга: кандидаты для всей
+    пачки берутся одним запросом по LSH-полосам. Возвращает (новые, дубли)
+    """
+    buckets = {bucket for item in news for bucket in item.lsh_buckets or ()}
+    candidates = candidates_for(News.objects.all(), buckets)
+    unique, duplicates = [], []
+    for item in news:
+        if best_match(item.minhash, item.lsh_buckets, candidates) is not None:
+            duplicates.append(item)
+            continue
+        unique.append(item)
+        if item.minhash:
+            # У статей пачки еще нет pk: вместо него source_url, чтобы совпадение с ними
+            # тоже считалось найденным оригиналом
+            candidates.append((item.source_url, item.minhash, item.lsh_buckets, None))
+    return unique, duplicates
+
+
+def save_news(news):
+    """Вставляет новости одним bulk_create и возвращает source_url реально созданных"""
+    if not news:
+        return set()
+    News.objects.bulk_create(news, ignore_conflicts=True, batch_size=500)
+    # С ignore_conflicts pk не возвращаются: свои строки узнаем по еще пустому search_vector
+    rows = list(News.objects.filter(
+        source_url__in=[item.source_url for item in news],
+        search_vector__isnull=True
+    ).values_list('pk', 'source_url', 'image_url'))
+    if rows:
+        from .tasks import process_news_image
+
+        News.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(search_vector=NEWS_SEARCH_VECTOR)
+        # Сигналы post_save при bulk_create не приходят: ленту сбрасываем
+        # и картинки отправляем на обработку сами
+        bump_version(LIST_VERSION_KEY)
+        for pk, _, image_url in rows:
+            if image_url:
+                transaction.on_commit(partial(process_news_image.delay, pk))
+    return {source_url for _, source_url, _ in rows}
+
+
+def ingest_sources(sources):
+    """
+    Проходит ленты источников NewsSource целиком и сохраняет новые статьи. Уже известные
+    ссылки отсеиваются одним запросом по source_url до скачивания статей,
+    неизмененные страницы пропускаются без разбора.
+    Статья, которая не разобралась или ответила 4xx, считается в failed, но источник
+    не роняет: источник падает только на ошибке ленты или сети.
+    Возвращает сводку по каждому источнику: parsed — разобранные страницы,
+    skipped — пропущенные по 304, совпавшему хэшу или как заведомо битые,
+    duplicates — почти-дубли уже известных статей, которые не сохранялись
+    """
+    summary = {
+        source.url: {
+            'status': 'ok', 'found': 0, 'new': 0, 'created': 0, 'duplicates': 0, 'failed': 0,
+            'parsed': 0, 'skipped': 0
+        }
+        for source in sources
+    }
+
+    def fail(source, error):
+        summary[source.url]['status'] = 'failed'
+        summary[source.url].setdefault('error', str(error))
+
+    with requests.Session() as session, \
+            ThreadPoolExecutor(max_workers=settings.NEWS_SCRAPER_CONCURRENCY) as executor:
+        links = {}
+        listing_pages = []
+        listings = _map(executor, fetch_listing, [(source, session) for source in sources])
+        for source, (result, error) in zip(sources, listings):
+            if error is not None:
+                logger.error(f"Ошибка парсинга ленты {source.url}: {error}")
+                fail(source, error)
+                continue
+            page, urls = result
+            listing_pages.append((source, page))
+            if urls is None:
+                summary[source.url]['skipped'] += 1
+                continue
+            summary[source.url]['parsed'] += 1
+            urls = urls[:settings.NEWS_SCRAPER_MAX_ARTICLES]
+            summary[source.url]['found'] = len(urls)
+            for url in urls:
+                links.setdefault(url, source)
+
+        existing = set(News.objects.filter(source_url__in=list(links)).values_list('source_url', flat=True))
+        broken = known_broken([url for url in links if url not in existing])
+        new_links = []
+        for url, source in links.items():
+            if url in broken:
+                summary[source.url]['skipped'] += 1
+            elif url not in existing:
+                new_links.append((source, url))
+        articles = _map(executor, fetch_article, [(source, url, session) for source, url in new_links])
+
+    news = []
+    sources_by_url = {}
+    article_pages = []
+    broken = []
+    for (source, url), (result, error) in zip(new_links, articles):
+        summary[source.url]['new'] += 1
+        if error is not None:
+            summary[source.url]['failed'] += 1
+            if is_permanent_error(error):
+                # Повтор источника эту статью не исправит: пропускаем ее и в следующих опросах
+                logger.warning(f"Статья пропущена: {url}: {error}")
+                broken.append(url)
+            else:
+                logger.error(f"Ошибка парсинга статьи {url}: {error}")
+                fail(source, error)
+            continue
+        page, article = result
+        article_pages.append(page)
+        if article is None:
+            # Статья не менялась, а в прошлый раз не сохранилась (например, дубль заголовка)
+            summary[source.url]['skipped'] += 1
+            continue
+        summary[source.url]['parsed'] += 1
+        news.append(build_news(article, source))
+        sources_by_url[article.url] = source
+
+    news, duplicates = drop_near_duplicates(news)
+    for item in duplicates:
+        logger.info(f"Пропущен почти-дубль уже сохраненной статьи: {item.source_url}")
+        summary[sources_by_url[item.source_url].url]['duplicates'] += 1
+    created = save_news(news)
+    remember_broken(broken)
+    # Ленту с упавшими статьями не запоминаем, чтобы повтор разобрал ее заново
+    remember_pages(article_pages + [
+        page for source, page in listing_pages if summary[source.url]['status'] == 'ok'
+    ])
+    for source, url in new_links:
+        if url in created:
+            summary[source.url]['created'] += 1
+    return summary
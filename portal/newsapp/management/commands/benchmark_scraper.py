@@ -0,0 +1,140 @@
+import resource
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from newsapp import ingest, scraper
+from newsapp.models import Category, NewsSource
+from newsapp.replay import Corpus, ReplayServer, build_synthetic_corpus
+
+# python manage.py benchmark_scraper --corpus corpus/ --runs 3
+# python manage.py benchmark_scraper --synthetic 5 30          — корпус из 5 лент по 30 статей
+# Каждый прогон идет в транзакции, которая откатывается: база после бенчмарка не меняется
+
+
+class Timings:
+    def __init__(self):
+        self.values = []
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        with self._lock:
+            self.values.append(value)
+
+    @property
+    def total(self):
+        return sum(self.values)
+
+
+@contextmanager
+def timed(module, name, timings):
+    # Разбор идет в потоках ThreadPoolExecutor, поэтому замеряем саму функцию
+    original = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            timings.add(time.perf_counter() - started)
+
+    setattr(module, name, wrapper)
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+class Command(BaseCommand):
+    help = 'Прогоняет news_pars по записанному корпусу через локальный сервер и печатает пропускную способность'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='Каталог корпуса из record_scraper_corpus')
+        parser.add_argument('--synthetic', type=int, nargs=2, metavar=('SOURCES', 'ARTICLES'),
+                            help='Сгенерировать корпус: SOURCES лент по ARTICLES статей')
+        parser.add_argument('--runs', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if bool(options['corpus']) == bool(options['synthetic']):
+            raise CommandError('Укажите --corpus или --synthetic')
+        with ExitStack() as stack:
+            if options['corpus']:
+                corpus = Corpus.load(options['corpus'])
+            else:
+                root = stack.enter_context(tempfile.TemporaryDirectory())
+                corpus = build_synthetic_corpus(root, *options['synthetic'])
+            if not corpus.sources:
+                raise CommandError('В корпусе нет источников')
+            server = stack.enter_context(ReplayServer(corpus))
+            for run in range(1, options['runs'] + 1):
+                self.report(run, self.run(server))
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(self.style.SUCCESS(f'Пиковый RSS: {peak / 1024:.1f} МБ'))
+
+    def run(self, server):
+        parse, listing_parse, build, db = Timings(), Timings(), Timings(), Timings()
+
+        def measure_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db.add(time.perf_counter() - started)
+
+        requests_before = server.requests
+        state_keys = [scraper.page_state_key(server.local_url(url)) for url in server.corpus.pages]
+        with transaction.atomic():
+            sources = [
+                NewsSource.objects.create(
+                    name=data['name'],
+                    url=server.local_url(data['url']),
+                    category=Category.objects.get_or_create(name=data['category'])[0],
+                    link_class=data['link_class'],
+                    image_class=data['image_class'],
+                    text_class=data['text_class'],
+                    fetch_mode='http',
+                )
+                for data in server.corpus.sources
+            ]
+            # Валидаторы с прошлого прогона превратили бы его в сплошные 304
+            cache.delete_many(state_keys)
+            with timed(scraper, 'parse_article', parse), timed(scraper, 'parse_listing', listing_parse), \
+                    timed(ingest, 'build_news', build), connection.execute_wrapper(measure_query):
+                started = time.perf_counter()
+                summary = ingest.ingest_sources(sources)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        cache.delete_many(state_keys)
+
+        return {
+            'elapsed': elapsed,
+            'pages': server.requests - requests_before,
+            'articles': len(parse.values),
+            'parse': parse.total,
+            'listing_parse': listing_parse.total,
+            'build': build.total,
+            'db': db.total,
+            'queries': len(db.values),
+            'created': sum(item['created'] for item in summary.values()),
+            'failed': sum(item['failed'] for item in summary.values()),
+            'failed_sources': sum(item['status'] == 'failed' for item in summary.values()),
+        }
+
+    def report(self, run, stats):
+        elapsed = stats['elapsed'] or 1e-9
+        per_article = stats['parse'] / stats['articles'] * 1000 if stats['articles'] else 0
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Прогон {run}'))
+        self.stdout.write(
+            f"  Страниц: {stats['pages']} за {elapsed:.2f} с ({stats['pages'] / elapsed:.1f} стр/с)\n"
+            f"  Разбор: {per_article:.2f} мс на статью ({stats['articles']} статей), "
+            f"ленты {stats['listing_parse'] * 1000:.1f} мс\n"
+            f"  Анонс и MinHash: {stats['build']:.3f} с\n"
+            f"  БД: {stats['db']:.3f} с, запросов {stats['queries']}\n"
+            f"  Создано новостей: {stats['created']}, ошибок в статьях: {stats['failed']}, "
+            f"лент с ошибками: {stats['failed_sources']}"
+        )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from newsapp.models import Category, News, NEWS_SEARCH_VECTOR
+from newsapp.pagination import keyset_queryset
+from newsapp.services import NewsService
+
+# python manage.py explain_news_queries --analyze
+# python manage.py explain_news_queries --seed 200000 --analyze  (только на тестовой базе!)
+
+
+class Command(BaseCommand):
+    help = 'Печатает EXPLAIN для основных запросов NewsService, чтобы проверить использование индексов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE — реально выполнить запросы')
+        parser.add_argument('--seed', type=int, default=0, help='Сначала создать N одобренных тестовых новостей')
+        parser.add_argument('--query', default='новости', help='Поисковая строка для запроса поиска')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stderr.write('Команда рассчитана на PostgreSQL')
+            return
+
+        if options['seed']:
+            self.seed(options['seed'])
+
+        category = Category.objects.order_by('id').first()
+        category_id = category.id if category else None
+        news = NewsService.get_news()
+        deep = news.order_by('-date_created', '-id')[1000:1001].first()
+
+        queries = {
+            'Лента главной (первая страница)': keyset_queryset(news)[:13],
+            'Лента категории': keyset_queryset(NewsService.get_news(category_id=category_id))[:13],
+            'Глубокая страница по курсору': keyset_queryset(news, deep.date_created, deep.pk)[:13]
+            if deep else keyset_queryset(news)[:13],
+            'Поиск': NewsService.get_news(query=options['query'])[:12],
+            'Проверка дублей по source_url в news_pars': News.objects.filter(
+                source_url__in=[f'https://example.com/{i}' for i in range(5)]
+            ).values_list('source_url', flat=True),
+        }
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(analyze=options['analyze']))
+            self.stdout.write('')
+
+    def seed(self, count, batch_size=5000):
+        categories = list(Category.objects.all()) or [Category.objects.create(name='Тест')]
+        start = News.objects.count()
+        for offset in range(0, count, batch_size):
+            News.objects.bulk_create([
+                News(
+                    title=f'explain-seed-{start + i}',
+                    content='Тестовые новости для проверки планов запросов ' * 20,
+                    category=categories[i % len(categories)],
+                    moderation_status='approved' if i % 10 else 'pending',
+                )
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+        News.objects.filter(title__startswith='explain-seed-').update(search_vector=NEWS_SEARCH_VECTOR)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {News._meta.db_table}')
+        self.stdout.write(self.style.SUCCESS(f'Создано {count} новостей'))
+
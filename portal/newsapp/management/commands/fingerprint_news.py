@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from newsapp.models import News
+
+# python manage.py fingerprint_news            — посчитать сигнатуры, где их нет
+# python manage.py fingerprint_news --mark     — и сразу пометить почти-дубли
+
+
+class Command(BaseCommand):
+    help = 'Считает MinHash-сигнатуры новостей без них и, с --mark, помечает почти-дубли'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mark', action='store_true', help='Пометить почти-дубли более ранних новостей')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        done = 0
+        news = News.objects.filter(minhash__isnull=True).exclude(content__isnull=True).exclude(content='')
+        for item in news.only('id', 'content').iterator(chunk_size=batch_size):
+            item.fill_fingerprint()
+            if item.minhash:
+                batch.append(item)
+            if len(batch) == batch_size:
+                done += self.flush(batch)
+                batch = []
+        done += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(f'Сигнатуры посчитаны для {done} новостей'))
+
+        if options['mark']:
+            marked = 0
+            for item in News.objects.filter(lsh_buckets__isnull=False).only(
+                'id', 'minhash', 'lsh_buckets', 'duplicate_of'
+            ).order_by('id').iterator(chunk_size=batch_size):
+                if item.mark_near_duplicate():
+                    marked += 1
+            self.stdout.write(self.style.SUCCESS(f'Помечено почти-дублей: {marked}'))
+
+    def flush(self, batch):
+        News.objects.bulk_update(batch, ['minhash', 'lsh_buckets'])
+        return len(batch)
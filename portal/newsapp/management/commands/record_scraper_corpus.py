@@ -0,0 +1,34 @@
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from newsapp.models import NewsSource
+from newsapp.replay import Corpus, record_source
+
+# python manage.py record_scraper_corpus corpus/                 — все включенные источники
+# python manage.py record_scraper_corpus corpus/ --source 1 2    — только выбранные
+
+
+class Command(BaseCommand):
+    help = 'Записывает ленты и статьи источников в корпус для benchmark_scraper'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог корпуса')
+        parser.add_argument('--source', type=int, nargs='*', help='id источников NewsSource')
+        parser.add_argument('--max-articles', type=int, default=settings.NEWS_SCRAPER_MAX_ARTICLES)
+
+    def handle(self, *args, **options):
+        sources = NewsSource.objects.filter(enabled=True).select_related('category')
+        if options['source']:
+            sources = sources.filter(pk__in=options['source'])
+        corpus = Corpus(options['path'])
+        with requests.Session() as session:
+            for source in sources:
+                try:
+                    count = record_source(corpus, source, session, options['max_articles'])
+                except Exception as e:
+                    self.stderr.write(f'{source.name}: {e}')
+                    continue
+                self.stdout.write(f'{source.name}: записано статей {count}')
+        corpus.save()
+        self.stdout.write(self.style.SUCCESS(f'Корпус сохранен: {len(corpus.pages)} страниц в {options["path"]}'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_search_vector(apps, schema_editor):
+    SearchVector = django.contrib.postgres.search.SearchVector
+    News = apps.get_model('newsapp', 'News')
+    News.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='russian') +
+        SearchVector('content', weight='B', config='russian')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0008_remove_news_tg_image_alter_news_image_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='news_search_vector_gin'),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0009_news_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('moderation_status', 'approved')), fields=['-date_created', '-id'], name='news_approved_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('moderation_status', 'approved')), fields=['category', '-date_created', '-id'], name='news_approved_cat_date_idx'),
+        ),
+    ]
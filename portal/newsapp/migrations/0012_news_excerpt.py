@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:20
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpt(apps, schema_editor):
+    News = apps.get_model('newsapp', 'News')
+    batch = []
+    for news in News.objects.only('id', 'content').iterator(chunk_size=1000):
+        content = news.content or ''
+        news.excerpt = Truncator(content).words(25)
+        news.word_count = len(content.split())
+        batch.append(news)
+        if len(batch) == 1000:
+            News.objects.bulk_update(batch, ['excerpt', 'word_count'])
+            batch = []
+    News.objects.bulk_update(batch, ['excerpt', 'word_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0011_news_title_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_excerpt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:21
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    News = apps.get_model('newsapp', 'News')
+    Comments = apps.get_model('newsapp', 'Comments')
+    count = Comments.objects.filter(news=models.OuterRef('pk')).order_by().values('news').annotate(
+        count=models.Count('id')
+    ).values('count')
+    News.objects.update(comments_count=Coalesce(models.Subquery(count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0012_news_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['news', '-date_created', '-id'], name='comments_news_date_idx'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
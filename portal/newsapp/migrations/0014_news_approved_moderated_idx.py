@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0013_comments_pagination'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('moderation_status', 'approved')), fields=['-moderation_date'], name='news_approved_moderated_idx'),
+        ),
+    ]
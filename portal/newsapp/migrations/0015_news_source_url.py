@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0014_news_approved_moderated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='source_url',
+            field=models.URLField(blank=True, editable=False, max_length=500, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Источники, которые раньше были зашиты в news_pars: (url, id категории)
+ONLINER_SOURCES = [
+    ('Люди', 'https://people.onliner.by/', 1),
+    ('Авто', 'https://auto.onliner.by/', 2),
+    ('Технологии', 'https://tech.onliner.by/', 3),
+    ('Недвижимость', 'https://realt.onliner.by/', 4),
+    ('Деньги', 'https://money.onliner.by/', 5),
+]
+
+
+def add_onliner_sources(apps, schema_editor):
+    Category = apps.get_model('newsapp', 'Category')
+    NewsSource = apps.get_model('newsapp', 'NewsSource')
+    categories = set(Category.objects.values_list('id', flat=True))
+    NewsSource.objects.bulk_create([
+        NewsSource(name=f'Onliner: {name}', url=url, category_id=category_id)
+        for name, url, category_id in ONLINER_SOURCES
+        if category_id in categories
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0015_news_source_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('url', models.URLField(unique=True)),
+                ('fetch_mode', models.CharField(choices=[('http', 'HTTP'), ('js', 'Браузер (JS)')], default='http', max_length=10)),
+                ('link_class', models.CharField(default='news-tidings__link', max_length=100)),
+                ('image_class', models.CharField(default='news-header__image', max_length=100)),
+                ('text_class', models.CharField(blank=True, default='news-text', max_length=100)),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('poll_interval', models.PositiveIntegerField(default=1800, help_text='Секунды между опросами')),
+                ('enabled', models.BooleanField(default=True)),
+                ('last_polled_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('next_poll_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sources', to='newsapp.category')),
+            ],
+            options={
+                'ordering': ['-priority', 'id'],
+            },
+        ),
+        migrations.RunPython(add_onliner_sources, migrations.RunPython.noop),
+    ]
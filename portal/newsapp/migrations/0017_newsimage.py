@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0016_newssource'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_url', models.CharField(max_length=500, unique=True)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('variants', models.JSONField(default=dict)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='news', to='newsapp.newsimage'),
+        ),
+    ]
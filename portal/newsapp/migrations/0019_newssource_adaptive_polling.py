@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0018_news_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newssource',
+            name='max_poll_interval',
+            field=models.PositiveIntegerField(default=7200),
+        ),
+        migrations.AddField(
+            model_name='newssource',
+            name='min_poll_interval',
+            field=models.PositiveIntegerField(default=300),
+        ),
+        migrations.AddField(
+            model_name='newssource',
+            name='publish_rate',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='newssource',
+            name='poll_interval',
+            field=models.PositiveIntegerField(default=1800, help_text='Секунды между опросами, подстраиваются под частоту публикаций'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0019_newssource_adaptive_polling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, unique=True)),
+                ('scale', models.PositiveIntegerField(default=1)),
+                ('rate', models.FloatField()),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
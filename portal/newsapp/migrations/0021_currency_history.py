@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0020_exchangerate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('ts', models.DateTimeField()),
+                ('date', models.DateField()),
+                ('rate', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['currency', 'ts'], name='currency_rate_ts_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CurrencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('period', models.CharField(choices=[('day', 'День'), ('week', 'Неделя')], max_length=4)),
+                ('start', models.DateField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'period', 'start'), name='currency_rollup_unique')],
+            },
+        ),
+    ]
@@ -1,5 +1,32 @@
-from django.db import models
+import datetime
+import math
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from django.utils import timezone
+from django.utils.text import Truncator
+
+from .fingerprint import best_match, candidates_for, lsh_buckets, minhash
+
+# Заголовок весит больше текста статьи при ранжировании результатов поиска
+NEWS_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config='russian') +
+    SearchVector('content', weight='B', config='russian')
+)
+# Поля, которые меняются только UPDATE-ами в БД: полное сохранение новости
+# не должно затирать их устаревшими значениями из памяти
+DB_MAINTAINED_FIELDS = {'views', 'comments_count', 'search_vector', 'image'}
+# Текст новости и поля, которые из него считаются при сохранении
+TEXT_FIELDS = ('title', 'content')
+CONTENT_DERIVED_FIELDS = {'excerpt', 'word_count', 'minhash', 'lsh_buckets'}
+MODERATION_FIELDS = ['moderation_status', 'moderated_by', 'moderation_date']
+# Анонс для карточки в ленте и скорость чтения для оценки времени
+EXCERPT_WORDS = 25
+READING_WORDS_PER_MINUTE = 200
 
 
 class Category(models.Model):
@@ -10,12 +37,180 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class NewsSource(models.Model):
+    objects = models.Manager()
+
+    name = models.CharField(max_length=100)
+    url = models.URLField(unique=True)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='sources')
+    fetch_mode = models.CharField(
+        max_length=10,
+        choices=[
+            ('http', 'HTTP'),
+            ('js', 'Браузер (JS)')
+        ],
+        default='http'
+    )
+    # CSS-классы: ссылка на статью в ленте, картинка шапки и блок текста статьи
+    link_class = models.CharField(max_length=100, default='news-tidings__link')
+    image_class = models.CharField(max_length=100, default='news-header__image')
+    text_class = models.CharField(max_length=100, blank=True, default='news-text')
+    # Источники с большим приоритетом раздаются воркерам первыми
+    priority = models.PositiveSmallIntegerField(default=0)
+    poll_interval = models.PositiveIntegerField(
+        default=1800,
+        help_text='Секунды между опросами, подстраиваются под частоту публикаций'
+    )
+    min_poll_interval = models.PositiveIntegerField(default=300)
+    max_poll_interval = models.PositiveIntegerField(default=7200)
+    # Скользящее среднее новых статей в час
+    publish_rate = models.FloatField(null=True, blank=True, editable=False)
+    enabled = models.BooleanField(default=True)
+    # Когда завершился последний успешный опрос; от него считается окно следующего
+    last_polled_at = models.DateTimeField(null=True, blank=True, editable=False)
+    next_poll_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-priority', 'id']
+
+    @property
+    def needs_js(self):
+        return self.fetch_mode == 'js'
+
+    def record_poll(self, new_items, polled_at=None):
+        """
+        Подстраивает интервал под частоту публикаций: следующий опрос — через время,
+        за которое в среднем выходит NEWS_POLL_TARGET_ITEMS статей, в границах
+        [min_poll_interval, max_poll_interval]
+        """
+        polled_at = polled_at or timezone.now()
+        if self.publish_rate is None or self.last_polled_at is None:
+            # Первый опрос забирает всю ленту разом, частоту по нему не оцениваем
+            rate = settings.NEWS_POLL_TARGET_ITEMS * 3600 / self.poll_interval
+        else:
+            # Окно опроса — реальное время с прошлого опроса: с задержкой планировщика
+            # и повторами news_pars_source оно длиннее poll_interval
+            elapsed = max((polled_at - self.last_polled_at).total_seconds(), 1)
+            sample = new_items * 3600 / elapsed
+            smoothing = settings.NEWS_POLL_RATE_SMOOTHING
+            rate = smoothing * sample + (1 - smoothing) * self.publish_rate
+
+        interval = settings.NEWS_POLL_TARGET_ITEMS * 3600 / rate if rate > 0 else self.max_poll_interval
+        self.poll_interval = int(min(max(interval, self.min_poll_interval), self.max_poll_interval))
+        self.publish_rate = rate
+        self.last_polled_at = polled_at
+        self.next_poll_at = polled_at + datetime.timedelta(seconds=self.poll_interval)
+        NewsSource.objects.filter(pk=self.pk).update(
+            publish_rate=self.publish_rate,
+            poll_interval=self.poll_interval,
+            last_polled_at=self.last_polled_at,
+            next_poll_at=self.next_poll_at
+        )
+
+    def __str__(self):
+        return self.name
+
 class TG_Author(models.Model):
     objects = models.Manager()
 
     telegram_user_id = models.BigIntegerField(null=True, blank=True)
     telegram_username = models.CharField(max_length=100, null=True, blank=True)
 
+class NewsImage(models.Model):
+    """
+    Картинка новости, скачанная один раз и пережатая в WebP и JPEG нескольких ширин.
+    Файлы вариантов названы по хэшу содержимого, одинаковые картинки делят их
+    """
+    objects = models.Manager()
+
+    # Адрес, из которого картинка скачана: внешний URL или путь /media/
+    source_url = models.CharField(max_length=500, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # {'webp': [[320, 'news_images/ab/abcd-320.webp'], ...], 'jpeg': [...]}, по возрастанию ширины
+    variants = models.JSONField(default=dict)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def srcset(self, fmt):
+        return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in self.variants.get(fmt, []))
+
+    @property
+    def src(self):
+        # Запасной src для браузеров без srcset — самый широкий JPEG
+        jpeg = self.variants.get('jpeg')
+        return default_storage.url(jpeg[-1][1]) if jpeg else self.source_url
+
+    def __str__(self):
+        return self.source_url
+
+class ExchangeRate(models.Model):
+    """
+    Последний полученный официальный курс НБРБ. Кеш курсов живет в Redis, а отсюда
+    виджет берет последние известные значения, если кеш пуст или НБРБ недоступен
+    """
+    objects = models.Manager()
+
+    # Буквенный код ISO 4217 (Cur_Abbreviation)
+    currency = models.CharField(max_length=3, unique=True)
+    # Курс дается за scale единиц валюты (за 100 RUB)
+    scale = models.PositiveIntegerField(default=1)
+    rate = models.FloatField()
+    date = models.DateField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.scale} {self.currency} = {self.rate} BYN'
+
+class CurrencyRate(models.Model):
+    """
+    История официальных курсов: строка пишется, только когда курс валюты изменился.
+    Графики и виджеты читают не ее, а готовые свертки CurrencyRollup
+    """
+    objects = models.Manager()
+
+    currency = models.CharField(max_length=3)
+    # Когда курс получен и на какую дату его установил НБРБ
+    ts = models.DateTimeField()
+    date = models.DateField()
+    # BYN за 1 единицу валюты, независимо от Cur_Scale
+    rate = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['currency', 'ts'], name='currency_rate_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.currency} {self.date}: {self.rate}'
+
+class CurrencyRollup(models.Model):
+    """Курс валюты за день или неделю (с понедельника), дополняется при каждом новом курсе"""
+    objects = models.Manager()
+
+    PERIOD_CHOICES = [
+        ('day', 'День'),
+        ('week', 'Неделя'),
+    ]
+
+    currency = models.CharField(max_length=3)
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    samples = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Он же индекс для выборки ряда по валюте и диапазону дат
+            models.UniqueConstraint(fields=['currency', 'period', 'start'], name='currency_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.currency} {self.period} {self.start}: {self.close}'
+
 class News(models.Model):
     objects = models.Manager()
 
@@ -28,6 +223,17 @@ class News(models.Model):
         blank=True
     )
     image_url = models.CharField(blank=True, null=True)
+    # Пережатые варианты image_url, заполняет задача process_news_image
+    image = models.ForeignKey(
+        NewsImage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='news'
+    )
+    # Канонический адрес статьи на сайте-источнике, по нему парсер отсеивает дубли
+    source_url = models.URLField(max_length=500, unique=True, null=True, blank=True, editable=False)
     author = models.CharField(max_length=50, blank=True, null=True)
     date_created = models.DateTimeField(auto_now_add=True)
     views = models.PositiveIntegerField(default=0)
@@ -53,18 +259,132 @@ class News(models.Model):
         blank=True
     )
     moderation_date = models.DateTimeField(null=True, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Заполняются при сохранении, чтобы лента не загружала полный текст
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # MinHash-сигнатура текста и ее LSH-полосы для поиска почти-дублей
+    minhash = ArrayField(models.BigIntegerField(), null=True, editable=False)
+    lsh_buckets = ArrayField(models.BigIntegerField(), null=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='duplicates'
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='news_search_vector_gin'),
+            # Кандидаты в почти-дубли: новости, совпавшие хотя бы в одной LSH-полосе
+            GinIndex(fields=['lsh_buckets'], name='news_lsh_buckets_gin'),
+            # Лента главной: только одобренные, свежие сверху, id — для keyset-курсора
+            models.Index(
+                fields=['-date_created', '-id'],
+                condition=models.Q(moderation_status='approved'),
+                name='news_approved_date_idx'
+            ),
+            models.Index(
+                fields=['category', '-date_created', '-id'],
+                condition=models.Q(moderation_status='approved'),
+                name='news_approved_cat_date_idx'
+            ),
+            # Last-Modified ленты: самая поздняя модерация среди одобренных
+            models.Index(
+                fields=['-moderation_date'],
+                condition=models.Q(moderation_status='approved'),
+                name='news_approved_moderated_idx'
+            ),
+            # Триграммы заголовков для автодополнения в поиске (расширение pg_trgm)
+            GinIndex(
+                OpClass('title', name='gin_trgm_ops'),
+                condition=models.Q(moderation_status='approved'),
+                name='news_title_trgm'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        news = super().from_db(db, field_names, values)
+        news._loaded_text = news.text_values()
+        return news
+
+    def text_values(self):
+        # Через __dict__, чтобы не догружать отложенные поля
+        return {name: self.__dict__.get(name) for name in TEXT_FIELDS}
+
+    def changed_text_fields(self):
+        """Поля TEXT_FIELDS, которые поменялись с загрузки из БД; у новой новости — все"""
+        loaded = getattr(self, '_loaded_text', None)
+        if self._state.adding or loaded is None:
+            return set(TEXT_FIELDS)
+        return {name for name in TEXT_FIELDS if name in self.__dict__ and self.__dict__[name] != loaded[name]}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            changed = self.changed_text_fields()
+        else:
+            changed = set(TEXT_FIELDS) & set(update_fields)
+        # Анонс, сигнатура и поисковый вектор пересчитываются только при правке текста:
+        # модерация и прочие сохранения их не трогают
+        if 'content' in changed:
+            self.fill_excerpt()
+            self.fill_fingerprint()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *CONTENT_DERIVED_FIELDS}
+        if update_fields is None and not self._state.adding:
+            skip = DB_MAINTAINED_FIELDS | self.get_deferred_fields()
+            if 'content' not in changed:
+                skip |= CONTENT_DERIVED_FIELDS
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skip
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_text = self.text_values()
+        if changed:
+            self.update_search_vector()
+
+    def fill_excerpt(self):
+        content = self.content or ''
+        self.excerpt = Truncator(content).words(EXCERPT_WORDS)
+        self.word_count = len(content.split())
+
+    def fill_fingerprint(self):
+        self.minhash = minhash(self.content)
+        self.lsh_buckets = lsh_buckets(self.minhash)
+
+    def mark_near_duplicate(self):
+        """Помечает новость дублем более ранней с почти тем же текстом, возвращает id оригинала"""
+        earlier = News.objects.filter(pk__lt=self.pk)
+        original_id = best_match(self.minhash, self.lsh_buckets, candidates_for(earlier, self.lsh_buckets))
+        if original_id != self.duplicate_of_id:
+            News.objects.filter(pk=self.pk).update(duplicate_of=original_id)
+            self.duplicate_of_id = original_id
+        return original_id
+
+    @property
+    def reading_time(self):
+        return max(1, math.ceil(self.word_count / READING_WORDS_PER_MINUTE))
+
+    def update_search_vector(self):
+        News.objects.filter(pk=self.pk).update(search_vector=NEWS_SEARCH_VECTOR)
 
     def approve(self, moderator):
         self.moderation_status = 'approved'
         self.moderated_by = moderator
         self.moderation_date = timezone.now()
-        self.save()
+        self.save(update_fields=MODERATION_FIELDS)
 
     def reject(self, moderator):
         self.moderation_status = 'rejected'
         self.moderated_by = moderator
         self.moderation_date = timezone.now()
-        self.save()
+        self.save(update_fields=MODERATION_FIELDS)
 
 
     def __str__(self):
@@ -83,5 +403,19 @@ class Comments(models.Model):
     author = models.CharField(max_length=50, null=True, blank=True)
     date_created = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Комментарии новости, свежие сверху, id — для keyset-курсора
+            models.Index(fields=['news', '-date_created', '-id'], name='comments_news_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Счетчик на News меняется в той же транзакции, что и комментарий
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and self.news_id:
+                News.objects.filter(pk=self.news_id).update(comments_count=models.F('comments_count') + 1)
+
     def __str__(self):
         return self.comments
\ No newline at end of file
@@ -0,0 +1,87 @@
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+
+LIST_VERSION_KEY = 'news_page_cache:version:list'
+
+# CSRF-токен свой у каждого посетителя, поэтому в кеш кладем страницу с заглушкой
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = '__csrf_token__'
+
+
+def detail_version_key(news_id):
+    return f'news_page_cache:version:detail:{news_id}'
+
+
+def bump_version(key):
+    # Новое поколение делает недоступными все страницы, закешированные со старым
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Старт с текущего времени, чтобы после вытеснения ключа не вернуться к старому поколению
+        initial = time.time_ns()
+        cache.set_many({key: initial for key in missing}, timeout=None)
+        versions.update({key: initial for key in missing})
+    return [versions[key] for key in keys]
+
+
+def _page_key(request, scope, versions):
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    version = '.'.join(str(v) for v in versions)
+    return f'news_page_cache:page:{scope}:{user}:{version}:{path}'
+
+
+def _build_response(content, request):
+    content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def versioned_cache_page(scope, version_keys):
+    """
+    Кеширует HTML страницы по ключу с номерами поколений из version_keys(**kwargs).
+    Кешируются только GET/HEAD-ответы со статусом 200. Попадание видно
+    по заголовку X-Cache: HIT или MISS
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            versions = get_versions(version_keys(**kwargs))
+            key = _page_key(request, scope, versions)
+            content = cache.get(key)
+            if content is not None:
+                response = _build_response(content, request)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                content = CSRF_INPUT_RE.sub(
+                    rf'\g<1>{CSRF_PLACEHOLDER}\g<2>',
+                    response.content.decode(response.charset)
+                )
+                cache.set(key, content, timeout=settings.NEWS_PAGE_CACHE_TIMEOUT)
+                patch_vary_headers(response, ('Cookie',))
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
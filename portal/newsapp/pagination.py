@@ -0,0 +1,94 @@
+import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'newsapp.cursor'
+
+
+def encode_cursor(obj, direction):
+    # Курсор непрозрачен для клиента: подписанная пара (date_created, id)
+    return signing.dumps(
+        {'d': obj.date_created.isoformat(), 'i': obj.pk, 'r': direction},
+        salt=CURSOR_SALT,
+        compress=True
+    )
+
+
+def decode_cursor(token):
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        return datetime.datetime.fromisoformat(data['d']), int(data['i']), data['r']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """Страница, выбранная по курсору (date_created, id) без OFFSET и COUNT(*)"""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None, total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def keyset_queryset(queryset, date_created=None, pk=None, direction='next'):
+    if direction == 'prev':
+        # Назад идем по возрастанию ключа, результат потом разворачивается
+        queryset = queryset.order_by('date_created', 'id')
+        if date_created is not None:
+            queryset = queryset.filter(date_created__gte=date_created).filter(
+                Q(date_created__gt=date_created) | Q(id__gt=pk)
+            )
+    else:
+        queryset = queryset.order_by('-date_created', '-id')
+        if date_created is not None:
+            # date_created__lte дает диапазон по индексу, Q отсекает только совпадения по дате
+            queryset = queryset.filter(date_created__lte=date_created).filter(
+                Q(date_created__lt=date_created) | Q(id__lt=pk)
+            )
+    return queryset
+
+
+def keyset_paginate(queryset, cursor=None, per_page=12):
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded is None:
+        date_created, pk, direction = None, None, 'next'
+    else:
+        date_created, pk, direction = decoded
+
+    queryset = keyset_queryset(queryset, date_created, pk, direction)
+    rows = list(queryset[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, date_created is not None
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], 'next') if rows and has_next else None,
+        prev_cursor=encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+    )
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .scraper import HTTP_HEADERS, HTTP_TIMEOUT, fetch_html_with_browser, parse_listing
+
+# Записанный корпус для прогона парсера без сети:
+#   manifest.json — {"sources": [{name, url, category, link_class, image_class, text_class}],
+#                    "pages": {исходный URL: "pages/<sha1>.html"}}
+#   pages/*.html  — снимки лент и статей как их отдал сайт
+MANIFEST = 'manifest.json'
+PAGES_DIR = 'pages'
+SOURCE_FIELDS = ('name', 'url', 'link_class', 'image_class', 'text_class')
+ROOT_RELATIVE_RE = re.compile(r'\b(href|src)=(["\'])/(?!/)')
+
+
+class Corpus:
+    def __init__(self, root, sources=None, pages=None):
+        self.root = Path(root)
+        self.sources = sources or []
+        self.pages = pages or {}
+
+    @classmethod
+    def load(cls, root):
+        root = Path(root)
+        manifest = json.loads((root / MANIFEST).read_text(encoding='utf-8'))
+        return cls(root, manifest['sources'], manifest['pages'])
+
+    def add_source(self, source):
+        data = {field: getattr(source, field) for field in SOURCE_FIELDS}
+        data['category'] = source.category.name
+        self.sources.append(data)
+
+    def add_page(self, url, html):
+        name = f'{PAGES_DIR}/{hashlib.sha1(url.encode()).hexdigest()}.html'
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(html, encoding='utf-8')
+        self.pages[url] = name
+
+    def read_page(self, url):
+        name = self.pages.get(url)
+        return (self.root / name).read_text(encoding='utf-8') if name else None
+
+    def find_page(self, host, path):
+        # Сервер не знает исходную схему: пробуем обе
+        for scheme in ('https', 'http'):
+            html = self.read_page(f'{scheme}://{host}/{path}')
+            if html is not None:
+                return html
+        return None
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / MANIFEST).write_text(
+            json.dumps({'sources': self.sources, 'pages': self.pages}, ensure_ascii=False, indent=2),
+            encoding='utf-8'
+        )
+
+    @property
+    def hosts(self):
+        return sorted({urlsplit(url).netloc for url in self.pages})
+
+
+def record_source(corpus, source, session, max_articles):
+    """Сохраняет в корпус ленту источника и до max_articles статей из нее как есть, без разбора"""
+    def download(url, wait_for_class):
+        if source.needs_js:
+            return fetch_html_with_browser(url, wait_for_class=wait_for_class)
+        response = session.get(url, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+
+    html = download(source.url, source.link_class)
+    corpus.add_page(source.url, html)
+    links = parse_listing(html, source.url, source.link_class)[:max_articles]
+    for url in links:
+        corpus.add_page(url, download(url, source.image_class))
+    # Источник попадает в манифест, только если записан целиком
+    corpus.add_source(source)
+    return len(links)
+
+
+class ReplayServer:
+    """
+    Локальный HTTP-сервер, отдающий корпус: страница https://host/path доступна
+    как http://127.0.0.1:<port>/host/path. Абсолютные ссылки на хосты корпуса
+    в HTML переписываются на сервер, поэтому парсер не выходит в сеть.
+    Отвечает ETag и 304 на If-None-Match, как настоящий сайт
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def local_url(self, url):
+        parts = urlsplit(url)
+        return f'{self.base_url}/{parts.netloc}{parts.path or "/"}' + (f'?{parts.query}' if parts.query else '')
+
+    def rewrite(self, html, host):
+        # Ссылки от корня сайта (/2026/...) тоже должны остаться внутри его каталога
+        html = ROOT_RELATIVE_RE.sub(rf'\1=\2/{host}/', html)
+        for known in self.corpus.hosts:
+            for scheme in ('https', 'http'):
+                html = html.replace(f'{scheme}://{known}/', f'{self.base_url}/{known}/')
+        return html
+
+    def _count(self, not_modified=False):
+        with self._lock:
+            self.requests += 1
+            self.not_modified += not_modified
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, как у настоящего сайта: requests.Session переиспользует соединения
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                host, _, path = self.path.lstrip('/').partition('/')
+                html = server.corpus.find_page(host, path)
+                if html is None:
+                    server._count()
+                    self.send_error(404)
+                    return
+                body = server.rewrite(html, host).encode()
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    server._count(not_modified=True)
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                server._count()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+WORDS = (
+    'город новости транспорт погода рынок курс банк жители проект улица школа врачи дорога ремонт '
+    'метро автобус цены выставка концерт спорт команда матч сезон зима лето праздник площадь парк '
+    'технологии смартфон сеть сервис компания завод рабочие зарплата налог закон суд решение '
+    'министерство отчет данные рост снижение спрос предложение квартира дом аренда строительство'
+).split()
+
+
+def build_synthetic_corpus(root, sources=5, articles=30, paragraphs=8, seed=1):
+    """Корпус в разметке onliner со случайными текстами — для бенчмарка на машине без записей"""
+    rng = random.Random(seed)
+    corpus = Corpus(root)
+    for index in range(sources):
+        host = f'section{index}.example.by'
+        base = f'https://{host}/'
+        corpus.sources.append({
+            'name': f'Раздел {index}', 'url': base, 'category': f'Раздел {index}',
+            'link_class': 'news-tidings__link', 'image_class': 'news-header__image', 'text_class': 'news-text',
+        })
+        links = []
+        for number in range(articles):
+            url = f'{base}2026/10/{number}'
+            links.append(f'<div class="news-tidings__item"><a href="{url}" class="news-tidings__link">'
+                         f'<span>{number}</span></a></div>')
+            title = ' '.join(rng.choice(WORDS) for _ in range(6)).capitalize()
+            body = ''.join(
+                '<p>' + ' '.join(rng.choice(WORDS) for _ in range(40)) + '.</p>'
+                for _ in range(paragraphs)
+            )
+            corpus.add_page(url, (
+                f'<html><body><div class="news-header"><h1>{title} {index}-{number}</h1>'
+                f'<div class="news-header__image" style="background-image: url(&quot;{base}img/{number}.jpeg&quot;);">'
+                f'</div></div><div class="news-text">{body}</div></body></html>'
+            ))
+        corpus.add_page(base, '<html><body><div class="news-tidings">' + ''.join(links) + '</div></body></html>')
+    corpus.save()
+    return corpus
@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .browser_pool import get_pool
+
+logger = logging.getLogger('app')
+
+# Классы по умолчанию, у каждого NewsSource они настраиваются свои
+LISTING_LINK_CLASS = 'news-tidings__link'
+HEADER_IMAGE_CLASS = 'news-header__image'
+# Контейнер текста статьи; если его нет, берем все абзацы страницы
+ARTICLE_TEXT_CLASS = 'news-text'
+
+HTTP_TIMEOUT = 10
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/120.0 Safari/537.36',
+    'Accept-Language': 'ru-RU,ru;q=0.9',
+}
+
+# Параметры рекламных и аналитических меток, которые не меняют страницу
+TRACKING_PARAM_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'ysclid', 'mc_cid', 'mc_eid', '_openstat'}
+
+STYLE_URL_RE = re.compile(r'url\(\s*["\']?\s*(https?://[^\s"\')]+)')
+
+
+@dataclass
+class Page:
+    url: str
+    # None — страница не изменилась с прошлого запуска
+    html: str = None
+    # ETag, Last-Modified и хэш тела; у страниц из браузера пустые
+    validators: dict = field(default_factory=dict)
+
+    @property
+    def changed(self):
+        return self.html is not None
+
+
+@dataclass
+class Article:
+    url: str
+    title: str
+    image_url: str
+    content: str
+
+
+# Теги без закрывающей пары, они не должны сбивать глубину вложенности
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+
+def canonical_url(url):
+    # Метки вроде utm_source и якоря не меняют статью, в ключ дедупликации не входят.
+    # Остальные параметры (news.php?id=5) статью определяют: оставляем их в одном порядке
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/') or '/'
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAM_PREFIXES) and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def _classes(attrs):
+    return (dict(attrs).get('class') or '').split()
+
+
+class ListingParser(HTMLParser):
+    """Собирает ссылки на статьи со страницы раздела"""
+
+    def __init__(self, base_url, link_class=LISTING_LINK_CLASS):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.link_class = link_class
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a' or self.link_class not in _classes(attrs):
+            return
+        href = dict(attrs).get('href')
+        if href:
+            url = canonical_url(urljoin(self.base_url, href))
+            if url not in self.links:
+                self.links.append(url)
+
+
+class ArticleParser(HTMLParser):
+    """Достает из статьи заголовок h1, картинку шапки и абзацы текста"""
+
+    def __init__(self, image_class=HEADER_IMAGE_CLASS, text_class=ARTICLE_TEXT_CLASS):
+        super().__init__(convert_charrefs=True)
+        self.image_class = image_class
+        self.text_class = text_class
+        self.title = ''
+        self.image_url = ''
+        self.paragraphs = []
+        self.body_paragraphs = []
+        self._stack = []
+        self._text_depth = None
+        self._h1 = None
+        self._p = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'br':
+            # Перенос строки разделяет слова, иначе "a<br>b" склеится в "ab".
+            # Пробел, а не \n: вместе с переводом строки в исходнике он дал бы границу абзаца
+            self.handle_data(' ')
+        if tag in VOID_TAGS:
+            return
+        if tag == 'p' and 'p' in self._stack:
+            # Новый абзац закрывает незакрытый предыдущий, как в браузере
+            self.handle_endtag('p')
+        self._stack.append(tag)
+        classes = _classes(attrs)
+        if self.image_class in classes and not self.image_url:
+            match = STYLE_URL_RE.search(dict(attrs).get('style') or '')
+            if match:
+                self.image_url = match.group(1)
+        if self.text_class and self.text_class in classes and self._text_depth is None:
+            self._text_depth = len(self._stack)
+        if tag == 'h1' and not self.title:
+            self._h1 = []
+        elif tag == 'p':
+            self._p = []
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or tag not in self._stack:
+            return
+        # Незакрытые теги внутри закрываются вместе с внешним, как в браузере
+        while self._stack:
+            if self._text_depth is not None and len(self._stack) == self._text_depth:
+                self._text_depth = None
+            closed = self._stack.pop()
+            if closed == 'h1' and self._h1 is not None:
+                self.title = ' '.join(''.join(self._h1).split())
+                self._h1 = None
+            elif closed == 'p' and self._p is not None:
+                text = ''.join(self._p).strip()
+                if text:
+                    self.paragraphs.append(text)
+                    if self._text_depth is not None:
+                        self.body_paragraphs.append(text)
+                self._p = None
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        if self._h1 is not None:
+            self._h1.append(data)
+        if self._p is not None:
+            self._p.append(data)
+
+
+def parse_listing(html, base_url, link_class=LISTING_LINK_CLASS):
+    parser = ListingParser(base_url, link_class)
+    parser.feed(html)
+    parser.close()
+    return parser.links
+
+
+def parse_article(html, url='', image_class=HEADER_IMAGE_CLASS, text_class=ARTICLE_TEXT_CLASS):
+    parser = ArticleParser(image_class, text_class)
+    parser.feed(html)
+    parser.close()
+    if not parser.title:
+        raise ValueError(f"Заголовок не найден: {url}")
+    if not parser.image_url:
+        logger.warning(f"URL изображения не найден: {url}")
+    paragraphs = parser.body_paragraphs or parser.paragraphs
+    logger.info(f"Найдено {len(paragraphs)} абзацев текста")
+    return Article(
+        url=url,
+        title=parser.title,
+        image_url=parser.image_url,
+        content="\n\n".join(paragraphs),
+    )
+
+
+def page_state_key(url):
+    return f'news_scraper:page:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def fetch_page(url, session=None):
+    """
+    Условный GET с ETag и Last-Modified прошлого ответа. Если сервер ответил 304
+    или тело совпало с прошлым по хэшу, html у страницы пустой и разбирать ее не нужно
+    """
+    previous = cache.get(page_state_key(url)) or {}
+    headers = dict(HTTP_HEADERS)
+    if previous.get('etag'):
+        headers['If-None-Match'] = previous['etag']
+    if previous.get('last_modified'):
+        headers['If-Modified-Since'] = previous['last_modified']
+
+    response = (session or requests).get(url, headers=headers, timeout=HTTP_TIMEOUT)
+    if response.status_code == 304:
+        return Page(url, validators=previous)
+    response.raise_for_status()
+    validators = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'hash': hashlib.sha256(response.content).hexdigest(),
+    }
+    if validators['hash'] == previous.get('hash'):
+        return Page(url, validators=validators)
+    return Page(url, response.text, validators)
+
+
+def broken_page_key(url):
+    return f'news_scraper:broken:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def is_permanent_error(error):
+    """
+    Ошибка статьи, которую повтор не исправит: на странице нет статьи
+    или сайт ответил 4xx (кроме 408 и 429, после них стоит повторить)
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in (408, 429)
+    return isinstance(error, ValueError)
+
+
+def remember_broken(urls):
+    # Такие статьи не скачиваются заново до истечения NEWS_SCRAPER_BROKEN_TIMEOUT
+    cache.set_many({broken_page_key(url): True for url in urls}, timeout=settings.NEWS_SCRAPER_BROKEN_TIMEOUT)
+
+
+def known_broken(urls):
+    keys = {broken_page_key(url): url for url in urls}
+    return {keys[key] for key in cache.get_many(list(keys))}
+
+
+def remember_pages(pages):
+    # Валидаторы сохраняем только после того, как страница обработана: иначе
+    # следующий запуск пропустил бы как неизмененную страницу, которую не дообработали
+    cache.set_many(
+        {page_state_key(page.url): page.validators for page in pages if page.validators},
+        timeout=settings.NEWS_SCRAPER_PAGE_STATE_TIMEOUT
+    )
+
+
+def fetch_html_with_browser(url, wait_for_class=None):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    with get_pool().browser(timeout=settings.NEWS_BROWSER_ACQUIRE_TIMEOUT) as driver:
+        driver.get(url)
+        wait = WebDriverWait(driver, settings.NEWS_BROWSER_WAIT_TIMEOUT)
+        if wait_for_class:
+            wait.until(EC.presence_of_element_located((By.CLASS_NAME, wait_for_class)))
+        else:
+            wait.until(lambda d: d.execute_script('return document.readyState') == 'complete')
+        return driver.page_source
+
+
+def fetch_listing(source, session=None):
+    """
+    Возвращает страницу раздела NewsSource и ссылки на все статьи в ней; ссылки None,
+    если раздел не менялся. Браузер запускается только для источников с fetch_mode='js'
+    """
+    if source.needs_js:
+        page = Page(source.url, fetch_html_with_browser(source.url, wait_for_class=source.link_class))
+    else:
+        page = fetch_page(source.url, session)
+    if not page.changed:
+        return page, None
+    links = parse_listing(page.html, source.url, source.link_class)
+    if not links:
+        raise ValueError(f"Ссылки на статьи не найдены: {source.url}")
+    return page, links
+
+
+def fetch_article(source, url, session=None):
+    if source.needs_js:
+        page = Page(url, fetch_html_with_browser(url, wait_for_class=source.image_class))
+    else:
+        page = fetch_page(url, session)
+    if not page.changed:
+        return page, None
+    return page, parse_article(page.html, url, source.image_class, source.text_class)
@@ -1,26 +1,126 @@
+import datetime
+import hashlib
+import json
+import logging
+import re
+
+import redis
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity
 from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, F
-from .models import News
+from django.db import connection, transaction
+from django.db.models import Q, Avg, BooleanField, ExpressionWrapper, F, Max, OuterRef, Subquery
+from django.utils import timezone
+from .currency import (
+    BASE_CURRENCY, SERIES_RANGES, cache_series, get_matrix, get_series, publish_matrix, record_samples, update_rollups
+)
+from .models import Category, Comments, ExchangeRate, News
+from .page_cache import LIST_VERSION_KEY, bump_version
+from .pagination import keyset_paginate
+from .view_counter import pending_views, register_view
 from weatherapp.models import Weather
 
+logger = logging.getLogger('app')
+
+# Маркеры подсветки в сниппете; в HTML их превращает фильтр highlight
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+# Данные боковых виджетов главной. Их публикуют задачи to_byn и fetch_weather,
+# а news_view забирает все одним cache.get_many
+RATE_CACHE_KEYS = {
+    'usd': 'dollar_to_byn_rate',
+    'eur': 'euro_to_byn_rate',
+    'rub': 'ruble_to_byn_rate'
+}
+RATES_TIMEOUT = 3600
+# Время получения курсов; по нему виджет помечает курсы как устаревшие
+RATES_UPDATED_KEY = 'currency_rates_updated_at'
+# Все официальные курсы НБРБ одним запросом
+NBRB_RATES_URL = 'https://api.nbrb.by/exrates/rates?periodicity=0'
+RATE_CURRENCIES = {
+    'usd': 'USD',
+    'eur': 'EUR',
+    'rub': 'RUB'
+}
+AVG_TEMPERATURE_KEY = 'sidebar_avg_temperature'
+AVG_TEMPERATURE_TIMEOUT = 2 * 3600
+CATEGORIES_KEY = 'sidebar_categories'
+
 
 class NewsService:
 
     @staticmethod
     def get_news(category_id=None, query=None):
-        news = News.objects.filter(moderation_status='approved').order_by('-date_created')
+        # Ленте хватает анонса: полный текст и поисковый вектор не загружаем
+        news = News.objects.filter(moderation_status='approved').select_related('category', 'image').defer(
+            'content', 'search_vector'
+        ).order_by('-date_created')
         if category_id:
             news = news.filter(category_id=category_id)
 
         if query:
-            news = news.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query)
-            )
+            if settings.NEWS_SEARCH_BACKEND == 'icontains':
+                news = news.filter(
+                    Q(title__icontains=query) |
+                    Q(content__icontains=query)
+                )
+            else:
+                news = NewsService.search_news(news, query)
 
         return news
 
+    @staticmethod
+    def search_news(news, query):
+        # Каждое слово ищем по префиксу, чтобы "интерес" находил "интересная"
+        words = re.findall(r'[^\W_]+', query)
+        if not words:
+            return news.none()
+        search_query = SearchQuery(
+            ' & '.join(f'{word}:*' for word in words),
+            config='russian',
+            search_type='raw'
+        )
+        return news.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+            headline=SearchHeadline(
+                'content',
+                search_query,
+                config='russian',
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                max_words=35,
+                min_words=15
+            )
+        ).order_by('-rank', '-date_created')
+
+    @staticmethod
+    def autocomplete(term):
+        term = ' '.join(term.split())[:50].lower()
+        if len(term) < settings.NEWS_AUTOCOMPLETE_MIN_LENGTH:
+            return []
+        cache_key = f'news_autocomplete:{hashlib.md5(term.encode()).hexdigest()}'
+        results = cache.get(cache_key)
+        if results is None:
+            # <% идет по триграммному GIN-индексу; ранжируем только первых кандидатов,
+            # чтобы частое слово не заставляло сортировать всю таблицу
+            candidates = News.objects.filter(
+                moderation_status='approved',
+                title__trigram_word_similar=term
+            ).values('id')[:settings.NEWS_AUTOCOMPLETE_CANDIDATES]
+            results = list(
+                News.objects.filter(id__in=candidates)
+                .annotate(
+                    similarity=TrigramWordSimilarity(term, 'title'),
+                    is_prefix=ExpressionWrapper(Q(title__istartswith=term), output_field=BooleanField())
+                )
+                .order_by('-is_prefix', '-similarity', '-date_created')
+                .values('id', 'title')[:settings.NEWS_AUTOCOMPLETE_LIMIT]
+            )
+            cache.set(cache_key, results, timeout=settings.NEWS_AUTOCOMPLETE_CACHE_TIMEOUT)
+        return results
+
     @staticmethod
     def get_paginated_news(news, page_number=1, per_page=12):
 
@@ -28,22 +128,197 @@ class NewsService:
         page_obj = paginator.get_page(page_number)
         return page_obj, paginator
 
+    @staticmethod
+    def get_keyset_page(news, cursor=None, per_page=12, with_total=False):
+        page_obj = keyset_paginate(news, cursor=cursor, per_page=per_page)
+        if with_total:
+            page_obj.total = NewsService.approx_count(news)
+        return page_obj
+
+    @staticmethod
+    def approx_count(news):
+        # Оценка числа строк из плана запроса вместо COUNT(*)
+        if connection.vendor != 'postgresql':
+            return None
+        plan = json.loads(news.order_by().explain(format='json'))
+        return plan[0]['Plan']['Plan Rows']
+
     @staticmethod
     def get_news_by_id(news_id):
 
-        return News.objects.get(id=news_id)
+        return News.objects.select_related('image').get(id=news_id)
+
+    @staticmethod
+    def list_last_modified():
+        # Оба максимума берутся из частичных индексов по одобренным новостям
+        dates = News.objects.filter(moderation_status='approved').aggregate(
+            created=Max('date_created'),
+            moderated=Max('moderation_date')
+        )
+        dates = [date for date in dates.values() if date]
+        return max(dates) if dates else None
+
+    @staticmethod
+    def detail_validators(news_id):
+        last_comment = Comments.objects.filter(news_id=OuterRef('pk')).order_by('-date_created')
+        return News.objects.filter(pk=news_id).annotate(
+            last_comment=Subquery(last_comment.values('date_created')[:1])
+        ).values('date_created', 'moderation_date', 'comments_count', 'last_comment').first()
+
+    @staticmethod
+    def get_comments_page(news_id, cursor=None, per_page=20):
+        comments = Comments.objects.filter(news_id=news_id)
+        return keyset_paginate(comments, cursor=cursor, per_page=per_page)
 
     @staticmethod
     def increment_views(news_id, request):
+        # Просмотры копятся в Redis и переносятся в БД задачей flush_news_views
+        if not request.session.session_key:
+            request.session.create()
+        try:
+            register_view(news_id, request.session.session_key)
+        except redis.RedisError as e:
+            logger.warning(f"Redis недоступен, просмотр пишется сразу в БД: {e}")
+            News.objects.filter(id=news_id).update(views=F('views') + 1)
+
+    @staticmethod
+    def merge_pending_views(news_items):
+        # Добавляем к News.views просмотры, которые еще не перенесены в БД
+        try:
+            deltas = pending_views([news.pk for news in news_items])
+        except redis.RedisError as e:
+            logger.warning(f"Не удалось получить просмотры из Redis: {e}")
+            return news_items
+        for news in news_items:
+            news.views += deltas.get(news.pk, 0)
+        return news_items
+
+    @staticmethod
+    def sidebar():
+        keys = [*RATE_CACHE_KEYS.values(), RATES_UPDATED_KEY, AVG_TEMPERATURE_KEY, CATEGORIES_KEY]
+        data = cache.get_many(keys)
+        # Холодный кеш: считаем из БД и кладем в кеш для следующих запросов
+        if AVG_TEMPERATURE_KEY not in data:
+            data[AVG_TEMPERATURE_KEY] = NewsService.cache_avg_temperature()
+        if CATEGORIES_KEY not in data:
+            data[CATEGORIES_KEY] = NewsService.cache_categories()
+        return {
+            **NewsService.rates_context(data),
+            't_avg': data[AVG_TEMPERATURE_KEY],
+            'categories': data[CATEGORIES_KEY],
+        }
+
+    @staticmethod
+    def rates_context(data):
+        # Кеш курсов пуст (Redis сброшен, НБРБ долго недоступен): берем последние известные из БД
+        if any(key not in data for key in RATE_CACHE_KEYS.values()):
+            data = {**data, **NewsService.cache_saved_rates()}
+        updated_at = data.get(RATES_UPDATED_KEY)
+        return {
+            'rate_usd': data.get(RATE_CACHE_KEYS['usd']),
+            'rate_eur': data.get(RATE_CACHE_KEYS['eur']),
+            'rate_rub': data.get(RATE_CACHE_KEYS['rub']),
+            'rates_updated_at': updated_at,
+            'rates_stale': updated_at is not None
+            and timezone.now() - updated_at > datetime.timedelta(seconds=settings.NEWS_RATES_STALE_AFTER),
+        }
+
+    @staticmethod
+    def cache_saved_rates():
+        saved = {
+            rate.currency: rate
+            for rate in ExchangeRate.objects.filter(currency__in=RATE_CURRENCIES.values())
+        }
+        if len(saved) < len(RATE_CURRENCIES):
+            return {}
+        data = {RATE_CACHE_KEYS[key]: saved[code].rate for key, code in RATE_CURRENCIES.items()}
+        data[RATES_UPDATED_KEY] = min(rate.updated_at for rate in saved.values())
+        # Версию ленты не меняем: курсы те же, что уже были на страницах
+        cache.set_many(data, timeout=RATES_TIMEOUT)
+        return data
+
+    @staticmethod
+    def save_rates(items):
+        """
+        Сохраняет ответ NBRB_RATES_URL в ExchangeRate одним upsert и публикует курсы
+        виджета в кеш. Возвращает курсы виджета {'usd': ..., 'eur': ..., 'rub': ...}
+        """
+        now = timezone.now()
+        rows = {
+            item['Cur_Abbreviation']: ExchangeRate(
+                currency=item['Cur_Abbreviation'],
+                scale=item['Cur_Scale'],
+                rate=item['Cur_OfficialRate'],
+                date=datetime.date.fromisoformat(item['Date'][:10]),
+                updated_at=now,
+            )
+            for item in items if item.get('Cur_OfficialRate') is not None
+        }
+        missing = [code for code in RATE_CURRENCIES.values() if code not in rows]
+        if missing:
+            raise ValueError(f"Курсы валют не найдены: {', '.join(missing)}")
+        with transaction.atomic():
+            previous = {
+                currency: (date, rate / scale)
+                for currency, date, rate, scale in ExchangeRate.objects.values_list('currency', 'date', 'rate', 'scale')
+            }
+            ExchangeRate.objects.bulk_create(
+                rows.values(),
+                update_conflicts=True,
+                unique_fields=['currency'],
+                update_fields=['scale', 'rate', 'date', 'updated_at']
+            )
+            # В историю и свертки попадают изменившиеся курсы и курсы на новую дату
+            samples = record_samples(rows.values(), previous)
+            update_rollups(samples)
+        if samples:
+            cache_series({sample.currency for sample in samples})
+            publish_matrix(rows.values())
+        rates = {key: rows[code].rate for key, code in RATE_CURRENCIES.items()}
+        NewsService.publish_rates(rates, updated_at=now)
+        return rates
 
-        news = News.objects.filter(id=news_id).first()
-        session_key = f'viewed_news_{news.pk}'
-        if not request.session.get(session_key, False):
-            News.objects.filter(id=news.pk).update(views=F('views') + 1)
-            news.refresh_from_db()
-            request.session[session_key] = True
-            request.session.set_expiry(600)
+    @staticmethod
+    def currency_series(currency, range_name):
+        """Ряд курса для графика из готовых сверток; None для неизвестной валюты или диапазона"""
+        currency = currency.upper()
+        # Проверяем по таблице кросс-курсов в памяти: ряды для произвольных строк
+        # не строятся и не засоряют кеш
+        if range_name not in SERIES_RANGES or currency == BASE_CURRENCY or currency not in get_matrix().index:
+            return None
+        return get_series(currency, range_name)
+
+    @staticmethod
+    def convert(amount, source, target):
+        """Пересчет по официальным кросс-курсам; ValueError для неизвестной валюты"""
+        return get_matrix().convert(amount, source.upper(), target.upper())
 
+    @staticmethod
+    def publish_rates(rates, updated_at=None):
+        # set_many уходит одним MULTI: виджет не увидит смесь старых и новых курсов
+        data = {RATE_CACHE_KEYS[code]: rate for code, rate in rates.items()}
+        data[RATES_UPDATED_KEY] = updated_at or timezone.now()
+        cache.set_many(data, timeout=RATES_TIMEOUT)
+        # Новые данные виджетов — новое поколение страниц ленты (и их ETag)
+        bump_version(LIST_VERSION_KEY)
+
+    @staticmethod
+    def publish_avg_temperature():
+        t_avg = NewsService.cache_avg_temperature()
+        bump_version(LIST_VERSION_KEY)
+        return t_avg
+
+    @staticmethod
+    def cache_avg_temperature():
+        t_avg = NewsService.avg_temperature()['t_avg']
+        cache.set(AVG_TEMPERATURE_KEY, t_avg, timeout=AVG_TEMPERATURE_TIMEOUT)
+        return t_avg
+
+    @staticmethod
+    def cache_categories():
+        categories = list(Category.objects.all())
+        cache.set(CATEGORIES_KEY, categories, timeout=None)
+        return categories
 
     @staticmethod
     def avg_temperature():
@@ -54,9 +329,6 @@ class NewsService:
 
     @staticmethod
     def currency():
-        rate_usd = cache.get('dollar_to_byn_rate')
-        rate_eur = cache.get('euro_to_byn_rate')
-        rate_rub = cache.get('ruble_to_byn_rate')
-
-        return rate_usd, rate_eur, rate_rub
+        rates = NewsService.rates_context(cache.get_many([*RATE_CACHE_KEYS.values(), RATES_UPDATED_KEY]))
+        return rates['rate_usd'], rates['rate_eur'], rates['rate_rub']
 
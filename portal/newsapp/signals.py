@@ -1,3 +1,54 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Comments, News
+from .page_cache import LIST_VERSION_KEY, bump_version, detail_version_key
+from .services import CATEGORIES_KEY
+from .tasks import process_news_image
+
+
+@receiver([post_save, post_delete], sender=News)
+def invalidate_news_pages(sender, instance, **kwargs):
+    # Одобрение, редактирование и удаление меняют и ленту, и страницу новости
+    bump_version(LIST_VERSION_KEY)
+    bump_version(detail_version_key(instance.pk))
+
+
+@receiver(post_save, sender=News)
+def schedule_image_processing(sender, instance, update_fields=None, **kwargs):
+    # Картинки скачиваются только для одобренных новостей (парсер сохраняет их сразу
+    # одобренными): ссылку из новости на модерации воркер не открывает
+    if not instance.image_url or instance.moderation_status != 'approved':
+        return
+    if update_fields is not None and not {'image_url', 'moderation_status'} & set(update_fields):
+        return
+    if instance.image_id and instance.image.source_url == instance.image_url:
+        return
+    # Картинку пережимает воркер, и только после коммита новости
+    transaction.on_commit(lambda: process_news_image.delay(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Comments)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    if instance.news_id:
+        bump_version(detail_version_key(instance.news_id))
+
+
+@receiver(post_delete, sender=Comments)
+def decrement_comments_count(sender, instance, **kwargs):
+    # post_delete срабатывает и при удалении через queryset, внутри его транзакции
+    if instance.news_id:
+        News.objects.filter(pk=instance.news_id).update(comments_count=F('comments_count') - 1)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    cache.delete(CATEGORIES_KEY)
+    bump_version(LIST_VERSION_KEY)
+
 # import asyncio
 # import logging
 #
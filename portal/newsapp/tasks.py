@@ -1,141 +1,121 @@
-import re
+import datetime
 from celery import shared_task
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
 import logging
 import requests
-from django.core.cache import cache
-import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
-from .models import News, Category
+from .images import ingest_image
+from .ingest import ingest_sources
+from .models import News, NewsSource
+from .page_cache import LIST_VERSION_KEY, bump_version, detail_version_key
+from .services import NBRB_RATES_URL, NewsService
+from .view_counter import flush_views
 
 logger = logging.getLogger('app')
 
 @shared_task(bind=True, max_retries=5, default_retry_delay=10)
 def to_byn(self):
     logger.info("Запуск задачи валютных курсов")
-    cache_keys = {
-        'usd': 'dollar_to_byn_rate',
-        'eur': 'euro_to_byn_rate',
-        'rub': 'ruble_to_byn_rate'
-    }
-    codes = {
-        'usd': 431,
-        'eur': 451,
-        'rub': 456
-    }
     try:
-        for key, code in codes.items():
-            url = f'https://api.nbrb.by/exrates/rates/{code}?periodicity=0'
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            rate = data.get('Cur_OfficialRate')
-            if rate is None:
-                raise ValueError(f"Курс валюты с кодом {code} не найден")
+        # Все курсы одним запросом: либо обновляются все, либо ни один
+        response = requests.get(NBRB_RATES_URL, timeout=10)
+        response.raise_for_status()
+        rates = NewsService.save_rates(response.json())
+        for key, rate in rates.items():
             logger.info(f"{key.upper()}: {rate}")
-            cache.set(cache_keys[key], rate, timeout=3600)
     except Exception as e:
+        # Виджет тем временем показывает последние сохраненные курсы
         logger.error(f"Ошибка: {e}")
         raise self.retry(exc=e)
 
 
-@shared_task(bind=True, max_retries=5, default_retry_delay=10)
-def news_pars(self):
-    logger.info("Запуск задачи парсинга новостей")
-    sources = [
-        ("https://people.onliner.by/", 1),
-        ("https://auto.onliner.by/", 2),
-        ("https://tech.onliner.by/", 3),
-        ("https://realt.onliner.by/", 4),
-        ("https://money.onliner.by/", 5)
-    ]
-    driver = None
-    for url, category_id in sources:
-        try:
-            driver = webdriver.Chrome()
-            driver.get(url)
-
-            # Ждем чтобы страница полностью загрузилась
-            time.sleep(3)
-            wait = WebDriverWait(driver, 10)
-
-
-            title_link = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.news-tidings__link")))
-            # Скроллим в видимую часть через JS
-
-            driver.execute_script("arguments[0].scrollIntoView(true);", title_link)
-            time.sleep(2)
-            # Кликаем через JS
-            driver.execute_script("arguments[0].click();", title_link)
-
-            time.sleep(3)
+@shared_task
+def flush_news_views():
+    return flush_views()
 
-            # Поиск заголовка
-            try:
-                titles = driver.find_elements(By.TAG_NAME, "h1")
-                if titles:
-                    title_text = titles[0].text.strip()
-                else:
-                    raise ValueError("Заголовок не найден")
-            except Exception as e:
-                logger.error(f"Ошибка при поиске заголовка: {e}")
-                raise
 
-            # Поиск изображения
-            try:
-                div_element = driver.find_element(By.CLASS_NAME, 'news-header__image')
-                style_attribute = div_element.get_attribute('style')
-                match = re.search(r'"\s*(https?://[^\s"]+)\s*"', style_attribute)
-                if match:
-                    image_url = match.group(1)
-                    logger.info(f"Найдено изображение: {image_url}")
-                else:
-                    logger.warning("URL изображения не найден")
-                    image_url = ""
-            except Exception as e:
-                logger.warning(f"Ошибка при поиске изображения: {e}")
-                raise
-
-            # Поиск контента
-            try:
-                paragraphs = driver.find_elements(By.TAG_NAME, "p")
-                content_texts = []
-                for p in paragraphs:
-                    text = p.get_attribute('innerText') or p.text
-                    if text.strip():
-                        content_texts.append(text.strip())
-
-                content_text = "\n\n".join(content_texts)
-                logger.info(f"Найдено {len(content_texts)} абзацев текста")
-            except Exception as e:
-                logger.error(f"Ошибка при поиске контента: {e}")
-                raise
-
-            # Сохранение в базу данных
-            try:
-                category_obj = Category.objects.get(id=category_id)
-                existing_news = News.objects.filter(
-                    title=title_text,
-                    category=category_obj
-                ).first()
-                if existing_news:
-                    continue
-                created = News.objects.create(
-                    title=title_text,
-                    image_url=image_url,
-                    content=content_text,
-                    category=category_obj,
-                    moderation_status='approved',
-                )
-            except Exception as e:
-                logger.error(f"Ошибка при сохранении новости в БД: {e}", exc_info=True)
-                raise
-
-        except Exception as e:
-            logger.error(f"Ошибка в задаче парсинга: {e}", exc_info=True)
-            # Пробрасываем исключение для retry механизма Celery
-            raise self.retry(exc=e)
-        finally:
-            driver.quit()
\ No newline at end of file
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def process_news_image(self, news_id):
+    news = News.objects.filter(pk=news_id).values('image_url', 'image__source_url').first()
+    if not news or not news['image_url'] or news['image_url'] == news['image__source_url']:
+        return None
+    image_url = news['image_url']
+    try:
+        image = ingest_image(image_url)
+    except requests.RequestException as e:
+        logger.warning(f"Не удалось скачать картинку {image_url}: {e}")
+        raise self.retry(exc=e)
+    except (OSError, ValueError) as e:
+        # Битый файл или не картинка: повтор не поможет, остается исходный image_url
+        logger.error(f"Не удалось обработать картинку {image_url}: {e}")
+        return None
+
+    # image_url мог смениться, пока картинка скачивалась
+    if News.objects.filter(pk=news_id, image_url=image_url).update(image=image):
+        bump_version(LIST_VERSION_KEY)
+        bump_version(detail_version_key(news_id))
+    return image.pk
+
+
+@shared_task
+def schedule_news_sources():
+    """
+    Раздает воркерам источники, которым подошло время опроса: каждый источник
+    парсится отдельной задачей news_pars_source, поэтому запуск не растет с их числом.
+    После опроса задача источника сама сдвигает next_poll_at по частоте публикаций
+    """
+    now = timezone.now()
+    due = NewsSource.objects.filter(enabled=True).filter(
+        Q(next_poll_at__isnull=True) | Q(next_poll_at__lte=now)
+    )
+    dispatched = []
+    for source in due:
+        # Условный UPDATE: источник не уйдет воркерам дважды, даже если планировщик запущен повторно
+        # last_polled_at не трогаем: по нему record_poll считает окно с прошлого опроса
+        claimed = NewsSource.objects.filter(pk=source.pk, next_poll_at=source.next_poll_at).update(
+            next_poll_at=now + datetime.timedelta(seconds=source.poll_interval)
+        )
+        if claimed:
+            news_pars_source.delay(source.pk)
+            dispatched.append(source.pk)
+    if dispatched:
+        logger.info(f"Источники отправлены на парсинг: {dispatched}")
+    return dispatched
+
+
+@shared_task
+def news_pars():
+    """
+    Парсит все включенные источники за один запуск. Упавшие источники не перезапускают
+    весь парсинг: каждый уходит в отдельную задачу news_pars_source со своими повторами
+    """
+    logger.info("Запуск задачи парсинга новостей")
+    sources = list(NewsSource.objects.filter(enabled=True))
+    summary = ingest_sources(sources)
+    for source in sources:
+        if summary[source.url]['status'] == 'failed':
+            news_pars_source.apply_async(args=[source.pk], countdown=settings.NEWS_SCRAPER_RETRY_DELAY)
+    parsed = sum(stats['parsed'] for stats in summary.values())
+    skipped = sum(stats['skipped'] for stats in summary.values())
+    logger.info(f"Парсинг завершен: разобрано страниц {parsed}, пропущено без изменений {skipped}. {summary}")
+    return summary
+
+
+@shared_task(bind=True, max_retries=5)
+def news_pars_source(self, source_id):
+    source = NewsSource.objects.filter(pk=source_id, enabled=True).first()
+    if source is None:
+        return {}
+    summary = ingest_sources([source])
+    if summary[source.url]['status'] == 'failed':
+        # Уже сохраненные статьи при повторе отсеются по source_url, скачаются только оставшиеся.
+        # Экспоненциальная задержка своя у каждого источника
+        raise self.retry(
+            exc=RuntimeError(summary[source.url]['error']),
+            countdown=settings.NEWS_SCRAPER_RETRY_DELAY * 2 ** (self.request.retries + 1)
+        )
+    stats = summary[source.url]
+    source.record_poll(stats['created'] + stats['duplicates'])
+    return summary
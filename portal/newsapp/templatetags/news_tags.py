@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from newsapp.services import HIGHLIGHT_START, HIGHLIGHT_STOP
+
+register = template.Library()
+
+
+@register.filter
+def highlight(headline):
+    # Сначала экранируем текст статьи, потом подставляем разметку подсветки
+    html = escape(headline)
+    html = html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    return mark_safe(html)
+
+
+@register.simple_tag
+def news_picture(news, alt='', sizes='100vw', css_class='', style='', lazy=True):
+    """
+    <picture> с WebP и JPEG srcset для обработанной картинки. Пока задача
+    process_news_image не отработала, отдается исходный image_url — в том числе
+    когда image_url сменили, а новая картинка еще не обработана или не обработалась
+    """
+    attrs = format_html(
+        'alt="{}" class="{}" style="{}" loading="{}" decoding="async"',
+        alt, css_class, style, 'lazy' if lazy else 'eager'
+    )
+    image = news.image
+    if image is None or not image.variants or image.source_url != news.image_url:
+        return format_html('<img src="{}" {}>', news.image_url, attrs)
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" {}>'
+        '</picture>',
+        image.srcset('webp'), sizes,
+        image.src, image.srcset('jpeg'), sizes, image.width, image.height, attrs
+    )
@@ -1,10 +1,34 @@
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from django.test import TestCase, Client, RequestFactory
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 import datetime
+import io
+import re
+import requests
+import shutil
+import socket
+import tempfile
+from pathlib import Path
+from unittest import mock
+from PIL import Image
+from .browser_pool import BrowserPool
+from .fingerprint import MINHASH_PERMUTATIONS, minhash, similarity
+from .currency import build_series, series_key
 from .forms import NewsForm
-from .models import News, Category, Comments
+from .images import load_image_bytes
+from .ingest import ingest_sources
+from .models import News, Category, Comments, CurrencyRate, CurrencyRollup, ExchangeRate, NewsImage, NewsSource
+from .replay import Corpus, ReplayServer, build_synthetic_corpus, record_source
+from .scraper import canonical_url, fetch_article, fetch_listing, parse_article, parse_listing
+from .services import AVG_TEMPERATURE_KEY, NBRB_RATES_URL, NewsService
+from weatherapp.models import City, Weather
+from .tasks import news_pars, news_pars_source, process_news_image, schedule_news_sources, to_byn
+from .view_counter import FLUSHING_KEY, PENDING_KEY, flush_views, get_client, pending_views
 
 
 class AddNewsViewTest(TestCase):
@@ -287,6 +311,1421 @@ class NewsViewTest(TestCase):
         self.assertEqual(len(news_in_context), 1)
         self.assertEqual(news_in_context[0].title, 'Еще одна политическая новость')
 
+class NewsSearchTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Экономика")
+        self.news_title = News.objects.create(
+            title='Курс доллара вырос',
+            content='Национальный банк опубликовал новые данные',
+            category=self.category,
+            moderation_status='approved'
+        )
+        self.news_content = News.objects.create(
+            title='Обзор недели',
+            content='Аналитики обсуждают курс доллара и инфляцию',
+            category=self.category,
+            moderation_status='approved'
+        )
+        self.url = reverse('news')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_search_vector_filled_on_save(self):
+        """search_vector заполняется при сохранении новости"""
+        self.news_title.refresh_from_db()
+        self.assertIsNotNone(self.news_title.search_vector)
+
+    def test_search_uses_stemming(self):
+        """Поиск находит словоформы"""
+        response = self.client.get(f'{self.url}?q=доллары')
+        titles = [news.title for news in response.context['news']]
+        self.assertIn('Курс доллара вырос', titles)
+        self.assertIn('Обзор недели', titles)
+
+    def test_search_ranks_title_matches_first(self):
+        """Совпадение в заголовке ранжируется выше совпадения в тексте"""
+        response = self.client.get(f'{self.url}?q=доллар')
+        news_in_context = response.context['news']
+        self.assertEqual(news_in_context[0].title, 'Курс доллара вырос')
+
+    def test_search_highlights_snippet(self):
+        """В карточке выводится сниппет с подсветкой"""
+        response = self.client.get(f'{self.url}?q=инфляция')
+        self.assertContains(response, '<mark>инфляцию</mark>')
+
+    def test_search_vector_updated_on_edit(self):
+        """После редактирования новость ищется по новому тексту"""
+        self.news_content.content = 'Теперь здесь про погоду'
+        self.news_content.save()
+        response = self.client.get(f'{self.url}?q=погода')
+        self.assertEqual(len(response.context['news']), 1)
+
+    def test_search_finds_news_after_approve(self):
+        """Новость появляется в поиске после одобрения"""
+        user = User.objects.create_user(username='moderator', password='testpass123')
+        pending = News.objects.create(
+            title='Новый тариф',
+            content='Содержание',
+            moderation_status='pending'
+        )
+        response = self.client.get(f'{self.url}?q=тариф')
+        self.assertEqual(len(response.context['news']), 0)
+        pending.approve(user)
+        response = self.client.get(f'{self.url}?q=тариф')
+        self.assertEqual(len(response.context['news']), 1)
+
+    @override_settings(NEWS_SEARCH_BACKEND='icontains')
+    def test_icontains_fallback(self):
+        """Старый поиск через icontains доступен через настройку"""
+        response = self.client.get(f'{self.url}?q=оллар')
+        self.assertEqual(len(response.context['news']), 2)
+
+
+class NewsExcerptTest(TestCase):
+    def setUp(self):
+        self.content = ' '.join(f'слово{i}' for i in range(450))
+        self.news = News.objects.create(
+            title='Длинная статья',
+            content=self.content,
+            moderation_status='approved'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_excerpt_and_word_count_filled_on_save(self):
+        """Анонс и число слов считаются при сохранении"""
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.excerpt, ' '.join(f'слово{i}' for i in range(25)) + '…')
+        self.assertEqual(self.news.word_count, 450)
+        self.assertEqual(self.news.reading_time, 3)
+
+    def test_excerpt_updated_with_update_fields(self):
+        """Анонс обновляется и при save(update_fields=['content'])"""
+        self.news.content = 'Короткий текст'
+        self.news.save(update_fields=['content'])
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.excerpt, 'Короткий текст')
+        self.assertEqual(self.news.word_count, 2)
+
+    def test_list_does_not_load_content(self):
+        """Лента не загружает полный текст статьи"""
+        response = self.client.get(reverse('news'))
+        news_item = response.context['news'][0]
+        self.assertIn('content', news_item.get_deferred_fields())
+        self.assertContains(response, 'слово24…')
+        self.assertNotContains(response, 'слово100')
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for title in ['Курс доллара вырос', 'Курсы валют на неделю', 'Погода в Минске', 'Новый курсор мыши']:
+            News.objects.create(title=title, content='Текст', moderation_status='approved')
+        News.objects.create(title='Курс евро на модерации', content='Текст')
+        self.url = reverse('news_autocomplete')
+
+    def tearDown(self):
+        cache.clear()
+
+    def titles(self, term):
+        response = self.client.get(self.url, {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.json()['results']]
+
+    def test_prefix_matches_first(self):
+        """Заголовки, начинающиеся с запроса, идут первыми"""
+        titles = self.titles('курс')
+        self.assertEqual(set(titles[:2]), {'Курс доллара вырос', 'Курсы валют на неделю'})
+        self.assertNotIn('Погода в Минске', titles)
+
+    def test_fuzzy_match_with_typo(self):
+        """Опечатка в запросе не мешает найти заголовок"""
+        self.assertIn('Погода в Минске', self.titles('погодя'))
+
+    def test_only_approved(self):
+        """Неодобренные новости не подсказываются"""
+        self.assertNotIn('Курс евро на модерации', self.titles('курс'))
+
+    def test_short_term_returns_nothing(self):
+        """Слишком короткий запрос не идет в БД"""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('к'), [])
+
+    def test_results_are_cached(self):
+        """Повторный запрос того же префикса берется из кеша"""
+        self.titles('Курс')
+        with self.assertNumQueries(0):
+            self.titles('  курс ')
+
+    def test_result_has_detail_url(self):
+        """Подсказка содержит ссылку на новость"""
+        news = News.objects.get(title='Погода в Минске')
+        response = self.client.get(self.url, {'q': 'погода'})
+        self.assertEqual(response.json()['results'][0]['url'], reverse('news_detail', args=[news.pk]))
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Люди")
+        now = timezone.now()
+        for i in range(30):
+            news = News.objects.create(
+                title=f'Новость {i}',
+                content='Содержание',
+                category=self.category,
+                moderation_status='approved'
+            )
+            # Пары новостей с одинаковой датой проверяют сортировку по id
+            News.objects.filter(pk=news.pk).update(
+                date_created=now - datetime.timedelta(hours=i // 2)
+            )
+        self.url = reverse('news')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_first_page_has_next_cursor(self):
+        """Первая страница содержит курсор на следующую и не содержит на предыдущую"""
+        response = self.client.get(self.url)
+        page = response.context['news']
+        self.assertEqual(len(page), 12)
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_walk_forward_and_back(self):
+        """Проход вперед по курсорам выдает все новости без повторов, назад — те же страницы"""
+        pages = []
+        response = self.client.get(self.url)
+        pages.append([news.pk for news in response.context['news']])
+        while response.context['news'].has_next():
+            response = self.client.get(f"{self.url}?cursor={response.context['news'].next_cursor}")
+            pages.append([news.pk for news in response.context['news']])
+
+        ids = [pk for page in pages for pk in page]
+        expected = list(
+            News.objects.order_by('-date_created', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(page) for page in pages], [12, 12, 6])
+
+        response = self.client.get(f"{self.url}?cursor={response.context['news'].prev_cursor}")
+        self.assertEqual([news.pk for news in response.context['news']], pages[1])
+        response = self.client.get(f"{self.url}?cursor={response.context['news'].prev_cursor}")
+        self.assertEqual([news.pk for news in response.context['news']], pages[0])
+        self.assertFalse(response.context['news'].has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Поддельный курсор приводит на первую страницу"""
+        response = self.client.get(f'{self.url}?cursor=garbage')
+        self.assertEqual(response.status_code, 200)
+        first = News.objects.order_by('-date_created', '-id').first()
+        self.assertEqual(response.context['news'][0], first)
+
+    def test_approximate_total_in_context(self):
+        """В keyset-режиме передается примерное число новостей"""
+        response = self.client.get(self.url)
+        self.assertIsInstance(response.context['news'].total, int)
+
+    @override_settings(NEWS_PAGINATION='page')
+    def test_page_mode(self):
+        """Режим 'page' использует Paginator"""
+        response = self.client.get(f'{self.url}?page=3')
+        self.assertEqual(response.context['news'].number, 3)
+        self.assertEqual(len(response.context['news']), 6)
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name="Авто")
+        self.news = News.objects.create(
+            title='Кешируемая новость',
+            content='Содержание',
+            category=self.category,
+            moderation_status='approved'
+        )
+        self.url = reverse('news')
+        self.detail_url = reverse('news_detail', kwargs={'pk': self.news.pk})
+
+    def tearDown(self):
+        cache.clear()
+        get_client().delete(PENDING_KEY, FLUSHING_KEY)
+
+    def test_list_page_served_from_cache(self):
+        """Повторный запрос ленты отдается из кеша"""
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+
+    def test_category_pages_cached_separately(self):
+        """Страницы разных категорий кешируются под разными ключами"""
+        self.client.get(self.url)
+        response = self.client.get(f'{self.url}?category={self.category.id}')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_approve_invalidates_list(self):
+        """Одобрение новости сбрасывает кеш ленты"""
+        pending = News.objects.create(title='Ждет модерации', content='Текст')
+        self.client.get(self.url)
+        pending.approve(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Ждет модерации')
+
+    def test_edit_invalidates_detail(self):
+        """Редактирование новости сбрасывает кеш ее страницы"""
+        self.client.get(self.detail_url)
+        self.news.content = 'Обновленное содержание'
+        self.news.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Обновленное содержание')
+
+    def test_comment_invalidates_detail(self):
+        """Новый комментарий сбрасывает кеш страницы новости"""
+        self.client.get(self.detail_url)
+        self.client.post(self.detail_url, {'comments': 'Первый комментарий'})
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Первый комментарий')
+
+    def test_cached_detail_still_counts_views(self):
+        """Просмотр засчитывается при отдаче страницы из кеша"""
+        self.client.get(self.detail_url)
+        other_client = Client()
+        response = other_client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        flush_views()
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.views, 2)
+
+    def test_cached_page_gets_own_csrf_token(self):
+        """Закешированная форма комментария принимает CSRF-токен нового посетителя"""
+        Client().get(self.detail_url)
+        csrf_client = Client(enforce_csrf_checks=True)
+        response = csrf_client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+        response = csrf_client.post(self.detail_url, {
+            'comments': 'Комментарий',
+            'csrfmiddlewaretoken': token
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def test_authenticated_users_get_own_pages(self):
+        """Авторизованный пользователь не получает страницу анонима из кеша"""
+        self.client.get(self.url)
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'testuser')
+
+    def test_post_bypasses_cache(self):
+        """POST-запросы не обслуживаются из кеша"""
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(self.detail_url)
+        response = self.client.post(self.detail_url, {'comments': ''})
+        self.assertFalse(response.has_header('X-Cache'))
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='moderator', password='testpass123')
+        self.news = News.objects.create(
+            title='Новость с валидаторами',
+            content='Содержание',
+            moderation_status='approved'
+        )
+        self.url = reverse('news')
+        self.detail_url = reverse('news_detail', kwargs={'pk': self.news.pk})
+
+    def tearDown(self):
+        cache.clear()
+        get_client().delete(PENDING_KEY, FLUSHING_KEY)
+
+    def test_list_has_validators(self):
+        """Лента отдает ETag и Last-Modified"""
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_list_not_modified(self):
+        """Совпавший ETag ленты дает 304"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_modified_after_approve(self):
+        """После одобрения новости ETag ленты меняется"""
+        etag = self.client.get(self.url)['ETag']
+        News.objects.create(title='Свежая', content='Текст').approve(self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_differs_per_category(self):
+        """У страниц категорий свои ETag"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(f'{self.url}?category=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_not_modified_still_counts_view(self):
+        """304 на странице новости, просмотр при этом засчитывается"""
+        etag = self.client.get(self.detail_url)['ETag']
+        response = Client().get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(pending_views([self.news.pk]), {self.news.pk: 2})
+
+    def test_detail_modified_after_comment(self):
+        """Новый комментарий меняет валидаторы страницы новости"""
+        response = self.client.get(self.detail_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        Comments.objects.create(
+            news=self.news,
+            comments='Комментарий',
+            date_created=timezone.now() + datetime.timedelta(seconds=5)
+        )
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_detail_if_modified_since(self):
+        """If-Modified-Since для неизмененной новости дает 304"""
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+
+TEST_DATA = Path(__file__).resolve().parent / 'test_data'
+
+
+def read_fixture(name):
+    return (TEST_DATA / name).read_text(encoding='utf-8')
+
+
+NEW_ROUTES_TEXT = (
+    'С понедельника в городе запускают три новых автобусных маршрута. Они свяжут спальные районы '
+    'с центром и станциями метро, интервал движения в час пик составит восемь минут, а вечером '
+    'автобусы будут ходить до полуночи.'
+)
+EVENING_MINSK_TEXT = (
+    'Вечером на проспекте включили праздничную подсветку. Гирлянды развесили на деревьях и фасадах, '
+    'у ратуши установили световые арки, а на площади открылась ярмарка с горячими напитками и '
+    'выступлениями уличных музыкантов до позднего вечера.'
+)
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200, headers=None):
+        self.text = text
+        self.content = text.encode()
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+class FakeSession:
+    """
+    Отдает сохраненные страницы вместо похода в сеть. На совпавший If-None-Match
+    из etags отвечает 304, адреса из failures один раз падают с ошибкой, адреса
+    из statuses всегда отвечают заданным кодом
+    """
+
+    def __init__(self, pages, etags=None, failures=(), statuses=None):
+        self.pages = pages
+        self.etags = etags or {}
+        self.failures = set(failures)
+        self.statuses = statuses or {}
+        self.requested = []
+        self.sent_headers = {}
+
+    def get(self, url, headers=None, **kwargs):
+        self.requested.append(url)
+        self.sent_headers[url] = headers or {}
+        if url in self.statuses:
+            return FakeResponse('', status_code=self.statuses[url])
+        if url not in self.pages or url in self.failures:
+            self.failures.discard(url)
+            raise ConnectionError("timeout")
+        etag = self.etags.get(url)
+        if etag and self.sent_headers[url].get('If-None-Match') == etag:
+            return FakeResponse('', status_code=304, headers={'ETag': etag})
+        return FakeResponse(self.pages[url], headers={'ETag': etag} if etag else {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class ScraperTest(TestCase):
+    def setUp(self):
+        # Валидаторы страниц хранятся в кеше и не должны переходить между тестами
+        cache.clear()
+        self.listing = read_fixture('onliner_listing.html')
+        self.article = read_fixture('onliner_article.html')
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_source(self, url='https://people.onliner.by/', category=None, **kwargs):
+        category = category or Category.objects.create(name="Люди")
+        return NewsSource.objects.create(name=url, url=url, category=category, **kwargs)
+
+    def run_news_pars(self, session):
+        with mock.patch('newsapp.ingest.requests.Session', return_value=session), \
+                mock.patch('newsapp.tasks.news_pars_source.apply_async') as retry:
+            summary = news_pars.apply().get()
+        return summary, retry
+
+    def test_parse_listing_collects_article_links(self):
+        """Из раздела берутся все ссылки на статьи, абсолютные и без повторов"""
+        links = parse_listing(self.listing, 'https://people.onliner.by/')
+        self.assertEqual(links, [
+            'https://people.onliner.by/2026/10/18/gorod-gotovitsya-k-zime',
+            'https://people.onliner.by/2026/10/18/novye-marshruty',
+            'https://people.onliner.by/2026/10/17/vecherniy-minsk',
+        ])
+
+    def test_canonical_url(self):
+        """Метки, якорь и завершающий слеш не влияют на ключ дедупликации"""
+        self.assertEqual(
+            canonical_url('HTTPS://People.Onliner.by/2026/10/18/news/?utm_source=tg#comments'),
+            'https://people.onliner.by/2026/10/18/news'
+        )
+
+    def test_canonical_url_keeps_article_query(self):
+        """Параметры, по которым сайт отдает статью, остаются в ключе и в ссылке"""
+        self.assertEqual(
+            canonical_url('https://site.by/news.php?utm_medium=x&page=2&id=5&fbclid=abc#top'),
+            'https://site.by/news.php?id=5&page=2'
+        )
+        source = self.create_source('https://site.by/')
+        session = FakeSession({'https://site.by/': (
+            '<a class="news-tidings__link" href="/news.php?id=5">5</a>'
+            '<a class="news-tidings__link" href="/news.php?id=6&utm_source=main">6</a>'
+        )})
+        page, links = fetch_listing(source, session)
+        self.assertEqual(links, ['https://site.by/news.php?id=5', 'https://site.by/news.php?id=6'])
+
+    def test_parse_article(self):
+        """Заголовок, картинка шапки и абзацы только из текста статьи"""
+        article = parse_article(self.article, 'https://people.onliner.by/a')
+        self.assertEqual(article.title, 'Город готовится к зиме')
+        self.assertEqual(article.image_url, 'https://imgproxy.onliner.by/article/header.jpeg')
+        paragraphs = article.content.split('\n\n')
+        self.assertEqual(len(paragraphs), 3)
+        self.assertEqual(paragraphs[0], 'Коммунальные службы начали подготовку техники к зимнему сезону.')
+        self.assertIn('«на всю зиму»', paragraphs[1])
+        self.assertTrue(paragraphs[2].startswith('Жителей просят'))
+        self.assertNotIn('Перепечатка', article.content)
+
+    def test_parse_article_without_text_container(self):
+        """Без блока news-text берутся все абзацы страницы"""
+        article = parse_article(read_fixture('onliner_article_plain.html'))
+        self.assertEqual(article.title, 'Курс доллара снизился')
+        self.assertEqual(article.image_url, 'https://imgproxy.onliner.by/money/rate.jpeg')
+        self.assertEqual(
+            article.content,
+            'Белорусский рубль укрепился на торгах.\n\nАналитики ожидают стабильности.'
+        )
+
+    def test_parse_article_unclosed_paragraphs_and_br(self):
+        """Незакрытый абзац закрывается следующим, br разделяет строки"""
+        article = parse_article(
+            '<h1>Заголовок<br>дня</h1><div class="news-text"><p>Первый<p>Второй<br>абзац<br/>текста</div>'
+        )
+        self.assertEqual(article.title, 'Заголовок дня')
+        self.assertEqual(article.content, 'Первый\n\nВторой абзац текста')
+
+    def test_parse_article_without_title(self):
+        """Страница без h1 считается ошибкой парсинга"""
+        with self.assertRaises(ValueError):
+            parse_article('<html><body><p>Текст</p></body></html>')
+
+    def article_pages(self):
+        # Три разные статьи по ссылкам из сохраненной ленты
+        pages = {'https://people.onliner.by/': self.listing}
+        for slug, title, body in [
+            ('2026/10/18/gorod-gotovitsya-k-zime', 'Город готовится к зиме', None),
+            ('2026/10/18/novye-marshruty', 'Новые маршруты автобусов', NEW_ROUTES_TEXT),
+            ('2026/10/17/vecherniy-minsk', 'Вечерний Минск', EVENING_MINSK_TEXT),
+        ]:
+            html = self.article.replace('Город готовится\n            к зиме', title)
+            if body:
+                html = re.sub(
+                    r'<div class="news-text">.*?<div class="news-reference">',
+                    f'<div class="news-text"><p>{body}</p></div><div class="news-reference">',
+                    html,
+                    flags=re.S
+                )
+            pages[f'https://people.onliner.by/{slug}'] = html
+        return pages
+
+    def test_fetch_over_http(self):
+        """Обычный источник парсится через HTTP, браузер не запускается"""
+        session = FakeSession(self.article_pages())
+        source = self.create_source()
+        with mock.patch('newsapp.scraper.fetch_html_with_browser') as browser:
+            page, links = fetch_listing(source, session)
+            page, article = fetch_article(source, links[0], session)
+        browser.assert_not_called()
+        self.assertEqual(article.title, 'Город готовится к зиме')
+        self.assertEqual(article.url, links[0])
+        self.assertEqual(len(session.requested), 2)
+
+    def test_fetch_needs_js(self):
+        """Источник с fetch_mode='js' получает страницы из браузера"""
+        session = FakeSession({})
+        source = self.create_source(fetch_mode='js')
+        pages = [self.listing, self.article]
+        with mock.patch('newsapp.scraper.fetch_html_with_browser', side_effect=lambda *a, **kw: pages.pop(0)) as browser:
+            page, links = fetch_listing(source, session)
+            page, article = fetch_article(source, links[0], session)
+        self.assertEqual(browser.call_count, 2)
+        self.assertEqual(session.requested, [])
+        self.assertEqual(article.image_url, 'https://imgproxy.onliner.by/article/header.jpeg')
+
+    def test_news_pars_ingests_whole_listing(self):
+        """Сохраняются все статьи ленты, с анонсом и поисковым вектором"""
+        category = Category.objects.create(name="Люди")
+        source = self.create_source(category=category)
+        summary, retry = self.run_news_pars(FakeSession(self.article_pages()))
+        self.assertEqual(summary[source.url], {
+            'status': 'ok', 'found': 3, 'new': 3, 'created': 3, 'duplicates': 0, 'failed': 0,
+            'parsed': 4, 'skipped': 0
+        })
+        retry.assert_not_called()
+        news = News.objects.get(source_url='https://people.onliner.by/2026/10/18/novye-marshruty')
+        self.assertEqual(news.title, 'Новые маршруты автобусов')
+        self.assertEqual(news.category, category)
+        self.assertEqual(news.moderation_status, 'approved')
+        self.assertTrue(news.excerpt.startswith('С понедельника в городе'))
+        self.assertGreater(news.word_count, 0)
+        self.assertIn(news, NewsService.get_news(query='маршруты'))
+
+    def test_news_pars_fetches_only_new_articles(self):
+        """Известные статьи отсеиваются одним запросом и повторно не скачиваются"""
+        category = Category.objects.create(name="Люди")
+        source = self.create_source(category=category)
+        News.objects.create(
+            title='Город готовится к зиме',
+            source_url='https://people.onliner.by/2026/10/18/gorod-gotovitsya-k-zime',
+            category=category
+        )
+        session = FakeSession(self.article_pages())
+        with CaptureQueriesContext(connection) as queries:
+            summary, retry = self.run_news_pars(session)
+        self.assertEqual(summary[source.url]['created'], 2)
+        self.assertNotIn('https://people.onliner.by/2026/10/18/gorod-gotovitsya-k-zime', session.requested)
+        self.assertEqual(len(session.requested), 3)
+        selects = [q for q in queries if 'source_url' in q['sql'] and q['sql'].startswith('SELECT')]
+        # Проверка дублей и поиск созданных строк — по одному запросу
+        self.assertEqual(len(selects), 2)
+        self.assertEqual(News.objects.filter(category=category).count(), 3)
+
+    def test_news_pars_isolates_failed_source(self):
+        """Упавший источник уходит на отдельный повтор, остальные сохраняются"""
+        people = Category.objects.create(name="Люди")
+        auto = Category.objects.create(name="Авто")
+        self.create_source(category=people)
+        auto_source = self.create_source('https://auto.onliner.by/', category=auto)
+        summary, retry = self.run_news_pars(FakeSession(self.article_pages()))
+
+        self.assertEqual(summary['https://people.onliner.by/']['created'], 3)
+        self.assertEqual(summary['https://auto.onliner.by/']['status'], 'failed')
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.kwargs['args'], [auto_source.pk])
+        self.assertEqual(News.objects.filter(category=people).count(), 3)
+
+    def test_news_pars_source_retries_only_missing_articles(self):
+        """Повтор источника скачивает только статьи, не сохраненные в прошлый раз"""
+        category = Category.objects.create(name="Люди")
+        source = self.create_source(category=category)
+        session = FakeSession(
+            self.article_pages(),
+            failures={'https://people.onliner.by/2026/10/17/vecherniy-minsk'}
+        )
+        with mock.patch('newsapp.ingest.requests.Session', return_value=session):
+            news_pars_source.apply(args=[source.pk])
+        self.assertEqual(News.objects.filter(category=category).count(), 3)
+        # Лента дважды: после упавшей статьи она не запоминается как разобранная.
+        # Две статьи по одному разу, упавшая — дважды
+        self.assertEqual(len(session.requested), 6)
+
+    def test_broken_article_does_not_fail_source(self):
+        """Статья без h1 считается в failed, а источник опрашивается успешно и без повторов"""
+        category = Category.objects.create(name="Люди")
+        source = self.create_source(category=category)
+        pages = self.article_pages()
+        broken_url = 'https://people.onliner.by/2026/10/17/vecherniy-minsk'
+        pages[broken_url] = '<html><body><p>Страница без заголовка</p></body></html>'
+        session = FakeSession(pages)
+        with mock.patch('newsapp.ingest.requests.Session', return_value=session):
+            result = news_pars_source.apply(args=[source.pk])
+
+        self.assertEqual(result.state, 'SUCCESS')
+        stats = result.get()[source.url]
+        self.assertEqual((stats['status'], stats['created'], stats['failed']), ('ok', 2, 1))
+        self.assertEqual(len(session.requested), 4)
+        source.refresh_from_db()
+        self.assertIsNotNone(source.last_polled_at)
+        self.assertIsNotNone(source.publish_rate)
+
+        # Лента запомнена, битая статья в следующих опросах не скачивается
+        session.requested.clear()
+        pages['https://people.onliner.by/'] = self.listing.replace('</body>', '<p>Новое</p></body>')
+        summary, retry = self.run_news_pars(session)
+        self.assertNotIn(broken_url, session.requested)
+        self.assertEqual(summary[source.url]['skipped'], 1)
+        retry.assert_not_called()
+
+    def test_missing_article_does_not_fail_source(self):
+        """404 статьи не повторяется, а ошибка сервера роняет источник"""
+        source = self.create_source()
+        session = FakeSession(self.article_pages(), statuses={
+            'https://people.onliner.by/2026/10/17/vecherniy-minsk': 404,
+        })
+        summary, retry = self.run_news_pars(session)
+        self.assertEqual((summary[source.url]['status'], summary[source.url]['failed']), ('ok', 1))
+        retry.assert_not_called()
+
+        cache.clear()
+        News.objects.all().delete()
+        session.statuses['https://people.onliner.by/2026/10/17/vecherniy-minsk'] = 503
+        summary, retry = self.run_news_pars(session)
+        self.assertEqual(summary[source.url]['status'], 'failed')
+        retry.assert_called_once()
+
+    def test_unchanged_listing_skipped_by_etag(self):
+        """Повторный запуск шлет If-None-Match и на 304 не разбирает ленту"""
+        category = Category.objects.create(name="Люди")
+        source = self.create_source(category=category)
+        session = FakeSession(self.article_pages(), etags={'https://people.onliner.by/': '"v1"'})
+        self.run_news_pars(session)
+        session.requested.clear()
+
+        with mock.patch('newsapp.scraper.parse_listing') as parse:
+            summary, retry = self.run_news_pars(session)
+        parse.assert_not_called()
+        self.assertEqual(session.sent_headers['https://people.onliner.by/']['If-None-Match'], '"v1"')
+        self.assertEqual(session.requested, ['https://people.onliner.by/'])
+        self.assertEqual(summary[source.url]['skipped'], 1)
+        self.assertEqual(summary[source.url]['parsed'], 0)
+
+    def test_unchanged_listing_skipped_by_hash(self):
+        """Без ETag совпавшее тело ответа определяется по хэшу"""
+        category = Category.objects.create(name="Люди")
+        source = self.create_source(category=category)
+        pages = self.article_pages()
+        session = FakeSession(pages)
+        self.run_news_pars(session)
+
+        with mock.patch('newsapp.scraper.parse_listing') as parse:
+            summary, retry = self.run_news_pars(session)
+        parse.assert_not_called()
+        self.assertEqual(summary[source.url]['skipped'], 1)
+
+        pages['https://people.onliner.by/'] = self.listing.replace('</body>', '<p>Новое</p></body>')
+        summary, retry = self.run_news_pars(session)
+        self.assertEqual(summary[source.url]['parsed'], 1)
+        self.assertEqual(summary[source.url]['new'], 0)
+
+    def test_news_pars_skips_near_duplicates(self):
+        """Перепечатка уже сохраненной статьи под другим заголовком не сохраняется"""
+        category = Category.objects.create(name="Люди")
+        original = News.objects.create(title='Автобусы пойдут по-новому', content=NEW_ROUTES_TEXT, category=category)
+        self.create_source(category=category)
+        summary, retry = self.run_news_pars(FakeSession(self.article_pages()))
+        stats = summary['https://people.onliner.by/']
+        self.assertEqual((stats['created'], stats['duplicates']), (2, 1))
+        self.assertFalse(News.objects.filter(title='Новые маршруты автобусов').exists())
+        self.assertTrue(News.objects.filter(pk=original.pk).exists())
+
+    def test_news_pars_skips_near_duplicates_in_one_listing(self):
+        """Почти одинаковые статьи из одной ленты сохраняются один раз"""
+        pages = self.article_pages()
+        repost = pages['https://people.onliner.by/2026/10/18/novye-marshruty'].replace(
+            'Новые маршруты автобусов', 'Автобусы пойдут по-новому'
+        ).replace('до полуночи', 'до часу ночи')
+        pages['https://people.onliner.by/2026/10/17/vecherniy-minsk'] = repost
+        self.create_source()
+        summary, retry = self.run_news_pars(FakeSession(pages))
+        stats = summary['https://people.onliner.by/']
+        self.assertEqual((stats['created'], stats['duplicates']), (2, 1))
+        self.assertTrue(News.objects.filter(title='Новые маршруты автобусов').exists())
+        self.assertFalse(News.objects.filter(title='Автобусы пойдут по-новому').exists())
+
+    def test_source_selectors_from_registry(self):
+        """Классы ссылок, картинки и текста берутся из настроек источника"""
+        source = self.create_source('https://example.by/', link_class='teaser', image_class='cover', text_class='body')
+        session = FakeSession({
+            'https://example.by/': '<a class="teaser" href="/a/1">1</a><a class="news-tidings__link" href="/x">x</a>',
+            'https://example.by/a/1': (
+                '<h1>Новость</h1><div class="cover" style="background: url(https://example.by/1.png)"></div>'
+                '<div class="body"><p>Текст</p></div><p>Подвал</p>'
+            ),
+        })
+        page, links = fetch_listing(source, session)
+        self.assertEqual(links, ['https://example.by/a/1'])
+        page, article = fetch_article(source, links[0], session)
+        self.assertEqual(article.image_url, 'https://example.by/1.png')
+        self.assertEqual(article.content, 'Текст')
+
+    def test_news_pars_skips_disabled_sources(self):
+        """Выключенные источники не парсятся"""
+        self.create_source(enabled=False)
+        session = FakeSession(self.article_pages())
+        summary, retry = self.run_news_pars(session)
+        self.assertEqual(summary, {})
+        self.assertEqual(session.requested, [])
+
+    def test_record_and_replay_corpus(self):
+        """Записанный корпус проходит весь news_pars через локальный сервер без сети"""
+        source = self.create_source()
+        with tempfile.TemporaryDirectory() as root:
+            corpus = Corpus(root)
+            self.assertEqual(record_source(corpus, source, FakeSession(self.article_pages()), 50), 3)
+            corpus.save()
+            with ReplayServer(Corpus.load(root)) as server:
+                source.url = server.local_url(source.url)
+                source.save()
+                summary = ingest_sources([source])
+
+        self.assertEqual(server.requests, 4)
+        self.assertEqual(summary[source.url]['created'], 3)
+        for url in News.objects.values_list('source_url', flat=True):
+            self.assertTrue(url.startswith(f'{server.base_url}/people.onliner.by/'))
+
+    def test_replay_server_rewrites_links_and_answers_304(self):
+        """Сервер корпуса переписывает ссылки на себя и отвечает 304 на совпавший ETag"""
+        with tempfile.TemporaryDirectory() as root:
+            corpus = build_synthetic_corpus(root, sources=1, articles=2)
+            with ReplayServer(corpus) as server:
+                url = server.local_url(corpus.sources[0]['url'])
+                first = requests.get(url)
+                second = requests.get(url, headers={'If-None-Match': first.headers['ETag']})
+                missing = requests.get(f'{server.base_url}/unknown.example.by/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(server.local_url('https://section0.example.by/2026/10/1'), first.text)
+        self.assertNotIn('https://section0.example.by', first.text)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(server.not_modified, 1)
+
+    def test_benchmark_scraper_rolls_back(self):
+        """Бенчмарк печатает замеры и не оставляет в базе ни источников, ни новостей"""
+        out = io.StringIO()
+        call_command('benchmark_scraper', synthetic=[2, 3], runs=2, stdout=out)
+        output = out.getvalue()
+
+        self.assertEqual(output.count('Страниц: 8 за'), 2)
+        self.assertEqual(output.count('Создано новостей: 6,'), 2)
+        self.assertIn('мс на статью (6 статей)', output)
+        self.assertIn('Пиковый RSS', output)
+        self.assertFalse(News.objects.exists())
+        self.assertFalse(NewsSource.objects.exists())
+
+
+class NearDuplicateTest(TestCase):
+    def setUp(self):
+        self.original = News.objects.create(
+            title='Новые маршруты', content=NEW_ROUTES_TEXT, moderation_status='approved'
+        )
+
+    def repost_text(self):
+        # Перепечатка с правкой, как делают агрегаторы
+        return NEW_ROUTES_TEXT.replace('до полуночи', 'до самой полуночи')
+
+    def test_signature_similarity(self):
+        """Правленая перепечатка похожа на оригинал, другой текст — нет"""
+        signature = minhash(NEW_ROUTES_TEXT)
+        self.assertEqual(len(signature), MINHASH_PERMUTATIONS)
+        self.assertGreaterEqual(similarity(signature, minhash(self.repost_text())), 0.8)
+        self.assertLess(similarity(signature, minhash(EVENING_MINSK_TEXT)), 0.2)
+
+    def test_short_text_not_fingerprinted(self):
+        """Короткие тексты не сравниваются"""
+        news = News.objects.create(title='Коротко', content='Всего три слова')
+        self.assertIsNone(news.minhash)
+        self.assertIsNone(news.lsh_buckets)
+
+    def test_save_fills_fingerprint(self):
+        """Сигнатура считается при сохранении и пересчитывается при смене текста"""
+        self.assertEqual(len(self.original.lsh_buckets), 16)
+        self.original.content = EVENING_MINSK_TEXT
+        self.original.save(update_fields=['content'])
+        self.original.refresh_from_db()
+        self.assertEqual(self.original.minhash, minhash(EVENING_MINSK_TEXT))
+
+    def test_moderation_keeps_fingerprint(self):
+        """Модерация и сохранение без правки текста не пересчитывают сигнатуру и вектор"""
+        user = User.objects.create_user(username='moderator', password='pass12345')
+        news = News.objects.get(pk=self.original.pk)
+        with mock.patch('newsapp.models.minhash') as fingerprint, \
+                CaptureQueriesContext(connection) as queries:
+            news.reject(user)
+            news.author = 'Редакция'
+            news.save()
+        fingerprint.assert_not_called()
+        # По одному UPDATE на сохранение, без пересчета search_vector
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('minhash', queries[1]['sql'])
+
+        news.content = EVENING_MINSK_TEXT
+        news.save()
+        news.refresh_from_db()
+        self.assertEqual(news.minhash, minhash(EVENING_MINSK_TEXT))
+        news.approve(user)
+        self.assertIn(news, NewsService.get_news(query='подсветку'))
+
+    def test_mark_near_duplicate(self):
+        """Перепечатка помечается дублем оригинала, дубль дубля — тоже оригинала"""
+        repost = News.objects.create(title='Автобусы пойдут по-новому', content=self.repost_text())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(repost.mark_near_duplicate(), self.original.pk)
+        # Поиск кандидатов и пометка
+        self.assertEqual(len(queries), 2)
+        self.assertIn('&&', queries[0]['sql'])
+
+        second = News.objects.create(title='И снова маршруты', content=self.repost_text() + ' Подробности позже.')
+        self.assertEqual(second.mark_near_duplicate(), self.original.pk)
+        self.assertEqual(set(self.original.duplicates.all()), {repost, second})
+
+    def test_unrelated_news_not_marked(self):
+        """Другая новость дублем не считается"""
+        news = News.objects.create(title='Подсветка', content=EVENING_MINSK_TEXT)
+        self.assertIsNone(news.mark_near_duplicate())
+        news.refresh_from_db()
+        self.assertIsNone(news.duplicate_of)
+
+    def test_original_not_marked_by_later_repost(self):
+        """Более ранняя новость не становится дублем поздней"""
+        News.objects.create(title='Автобусы пойдут по-новому', content=self.repost_text())
+        self.assertIsNone(self.original.mark_near_duplicate())
+
+    def test_admin_action_marks_duplicates(self):
+        """Действие админки помечает почти-дубли среди выбранных"""
+        admin_user = User.objects.create_superuser(username='admin', password='adminpass123')
+        repost = News.objects.create(title='Автобусы пойдут по-новому', content=self.repost_text())
+        self.client.force_login(admin_user)
+        self.client.post(reverse('admin:newsapp_news_changelist'), {
+            'action': 'find_duplicates_selected',
+            '_selected_action': [repost.pk, self.original.pk],
+        })
+        repost.refresh_from_db()
+        self.assertEqual(repost.duplicate_of, self.original)
+        response = self.client.get(reverse('admin:newsapp_news_changelist'), {'duplicate': 'yes'})
+        self.assertEqual(list(response.context['cl'].queryset), [repost])
+
+
+class ScheduleNewsSourcesTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Люди")
+
+    def create_source(self, name, **kwargs):
+        return NewsSource.objects.create(
+            name=name, url=f'https://{name}.example.by/', category=self.category, **kwargs
+        )
+
+    def test_due_sources_dispatched_by_priority(self):
+        """Планировщик раздает только подошедшие источники, важные первыми"""
+        low = self.create_source('low')
+        high = self.create_source('high', priority=10)
+        self.create_source('off', enabled=False)
+        self.create_source('later', next_poll_at=timezone.now() + datetime.timedelta(minutes=5))
+
+        with mock.patch('newsapp.tasks.news_pars_source.delay') as delay:
+            dispatched = schedule_news_sources.apply().get()
+        self.assertEqual(dispatched, [high.pk, low.pk])
+        self.assertEqual([c.args for c in delay.call_args_list], [(high.pk,), (low.pk,)])
+
+    def test_dispatched_source_waits_poll_interval(self):
+        """После раздачи источник ждет poll_interval и повторно не раздается"""
+        source = self.create_source('people', poll_interval=600)
+        started = timezone.now()
+        with mock.patch('newsapp.tasks.news_pars_source.delay') as delay:
+            schedule_news_sources.apply()
+            schedule_news_sources.apply()
+        delay.assert_called_once_with(source.pk)
+        source.refresh_from_db()
+        self.assertAlmostEqual((source.next_poll_at - started).total_seconds(), 600, delta=5)
+        # Время прошлого опроса остается для record_poll
+        self.assertIsNone(source.last_polled_at)
+
+    def test_first_poll_keeps_interval(self):
+        """Первый опрос забирает всю ленту и частоту не искажает"""
+        source = self.create_source('people', poll_interval=1800)
+        source.record_poll(50)
+        source.refresh_from_db()
+        self.assertEqual(source.poll_interval, 1800)
+        self.assertAlmostEqual(source.publish_rate, 2.0)
+
+    def test_busy_source_polled_more_often(self):
+        """На частых публикациях интервал сокращается, но не ниже минимума"""
+        source = self.create_source(
+            'people', poll_interval=1800, publish_rate=2.0, min_poll_interval=300,
+            last_polled_at=timezone.now(), next_poll_at=timezone.now() + datetime.timedelta(seconds=1800)
+        )
+        # Опросы проходят точно по расписанию
+        intervals = []
+        for _ in range(10):
+            source.record_poll(4, polled_at=source.next_poll_at)
+            intervals.append(source.poll_interval)
+        self.assertLess(intervals[0], 1800)
+        self.assertEqual(intervals, sorted(intervals, reverse=True))
+        self.assertEqual(intervals[-1], 300)
+        source.refresh_from_db()
+        self.assertEqual(source.poll_interval, 300)
+
+    def test_quiet_source_backs_off(self):
+        """Пустые опросы растягивают интервал до максимума"""
+        source = self.create_source(
+            'people', poll_interval=1800, publish_rate=2.0, max_poll_interval=7200,
+            last_polled_at=timezone.now(), next_poll_at=timezone.now() + datetime.timedelta(seconds=1800)
+        )
+        # Опросы проходят точно по расписанию
+        intervals = []
+        for _ in range(10):
+            source.record_poll(0, polled_at=source.next_poll_at)
+            intervals.append(source.poll_interval)
+        self.assertGreater(intervals[0], 1800)
+        self.assertEqual(intervals[-1], 7200)
+
+    def test_rate_uses_actual_time_since_last_poll(self):
+        """Частота считается по реальному окну с прошлого опроса, а не по poll_interval"""
+        previous = timezone.now() - datetime.timedelta(hours=1)
+        source = self.create_source('people', poll_interval=1800, publish_rate=2.0, last_polled_at=previous)
+        polled_at = previous + datetime.timedelta(hours=1)
+        source.record_poll(4, polled_at=polled_at)
+        # 4 статьи за час, а не за полчаса: 0.3 * 4 + 0.7 * 2
+        self.assertAlmostEqual(source.publish_rate, 2.6)
+        source.refresh_from_db()
+        self.assertEqual(source.last_polled_at, polled_at)
+        self.assertEqual(source.next_poll_at, polled_at + datetime.timedelta(seconds=source.poll_interval))
+
+    def test_source_task_records_poll(self):
+        """Успешный опрос обновляет частоту публикаций источника"""
+        source = self.create_source('people', publish_rate=2.0)
+        summary = {source.url: {'status': 'ok', 'created': 3, 'duplicates': 1}}
+        with mock.patch('newsapp.tasks.ingest_sources', return_value=summary), \
+                mock.patch('newsapp.models.NewsSource.record_poll', autospec=True) as record:
+            news_pars_source.apply(args=[source.pk])
+        record.assert_called_once()
+        self.assertEqual(record.call_args.args[1], 4)
+
+    def test_disabled_source_task_is_noop(self):
+        """Задача выключенного источника ничего не скачивает"""
+        source = self.create_source('off', enabled=False)
+        with mock.patch('newsapp.tasks.ingest_sources') as ingest:
+            result = news_pars_source.apply(args=[source.pk]).get()
+        ingest.assert_not_called()
+        self.assertEqual(result, {})
+
+
+def make_image(width, height, fmt='JPEG', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), 'red').save(buffer, fmt)
+    return buffer.getvalue()
+
+
+GETADDRINFO = socket.getaddrinfo
+
+
+class FakeImageResponse:
+    def __init__(self, data, location=None):
+        self.data = data
+        self.is_redirect = location is not None
+        self.headers = {'Location': location} if location else {}
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class ImagePipelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        # Хосты из тестов резолвятся без сети: по умолчанию в публичный адрес
+        self.resolved = {}
+        self.resolver = mock.patch('newsapp.images.socket.getaddrinfo', side_effect=self.getaddrinfo)
+        self.resolver.start()
+
+    def tearDown(self):
+        self.resolver.stop()
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        cache.clear()
+
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        # IP-адреса (и подключение к Redis) резолвятся как обычно
+        if host not in self.resolved and (host[0].isdigit() or ':' in host):
+            return GETADDRINFO(host, port, *args, **kwargs)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (self.resolved.get(host, '93.184.216.34'), port))]
+
+    def save_bot_photo(self, data, name='photo.jpg'):
+        directory = Path(self.media_root) / 'news_photos'
+        directory.mkdir(exist_ok=True)
+        (directory / name).write_bytes(data)
+        return f'/media/news_photos/{name}'
+
+    def test_bot_photo_gets_variants(self):
+        """Фото из бота пережимается в WebP и JPEG всех ширин с именами по хэшу"""
+        news = News.objects.create(title='С фото', content='Текст', image_url=self.save_bot_photo(make_image(1200, 800)))
+        process_news_image.apply(args=[news.pk])
+
+        news.refresh_from_db()
+        image = news.image
+        self.assertEqual((image.width, image.height), (1200, 800))
+        self.assertEqual([width for width, name in image.variants['webp']], [320, 640, 960])
+        for fmt in ('webp', 'jpeg'):
+            for width, name in image.variants[fmt]:
+                self.assertIn(image.content_hash, name)
+                self.assertTrue((Path(self.media_root) / name).exists())
+        with Image.open(Path(self.media_root) / image.variants['jpeg'][0][1]) as variant:
+            self.assertEqual(variant.size, (320, 213))
+        self.assertIn('640w', image.srcset('webp'))
+
+    def test_small_image_not_upscaled(self):
+        """Картинка уже самой маленькой ширины сохраняется в исходном размере"""
+        news = News.objects.create(title='Маленькая', image_url=self.save_bot_photo(make_image(200, 100, 'PNG', 'RGBA'), 'a.png'))
+        process_news_image.apply(args=[news.pk])
+        news.refresh_from_db()
+        self.assertEqual(news.image.variants['jpeg'], [[200, news.image.variants['jpeg'][0][1]]])
+
+    def test_remote_image_downloaded_once(self):
+        """Один и тот же адрес скачивается один раз, даже для разных новостей"""
+        url = 'https://imgproxy.onliner.by/article/header.jpeg'
+        first = News.objects.create(title='Первая', image_url=url)
+        second = News.objects.create(title='Вторая', image_url=url)
+        with mock.patch('newsapp.images.requests.get', return_value=FakeImageResponse(make_image(800, 600))) as get:
+            process_news_image.apply(args=[first.pk])
+            process_news_image.apply(args=[second.pk])
+        get.assert_called_once()
+        self.assertEqual(NewsImage.objects.count(), 1)
+        self.assertEqual(News.objects.filter(image__source_url=url).count(), 2)
+
+    def test_same_content_reuses_variants(self):
+        """Та же картинка по другому адресу не пережимается заново"""
+        data = make_image(800, 600)
+        first = News.objects.create(title='Первая', image_url=self.save_bot_photo(data, 'a.jpg'))
+        second = News.objects.create(title='Вторая', image_url=self.save_bot_photo(data, 'b.jpg'))
+        process_news_image.apply(args=[first.pk])
+        with mock.patch('newsapp.images.build_variants') as build:
+            process_news_image.apply(args=[second.pk])
+        build.assert_not_called()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertNotEqual(first.image_id, second.image_id)
+        self.assertEqual(first.image.variants, second.image.variants)
+
+    def test_broken_image_left_as_is(self):
+        """Битый файл не ломает задачу, остается исходный image_url"""
+        news = News.objects.create(title='Битая', image_url=self.save_bot_photo(b'not an image'))
+        process_news_image.apply(args=[news.pk])
+        news.refresh_from_db()
+        self.assertIsNone(news.image)
+
+    def test_saving_news_schedules_processing(self):
+        """Новая картинка отправляется на обработку после коммита"""
+        with mock.patch('newsapp.tasks.process_news_image.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                news = News.objects.create(
+                    title='С картинкой', image_url='https://example.by/1.jpg', moderation_status='approved'
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(title='Без картинки', moderation_status='approved')
+        delay.assert_called_once_with(news.pk)
+
+    def test_pending_news_image_processed_after_approve(self):
+        """Картинку новости на модерации воркер не скачивает, пока ее не одобрят"""
+        user = User.objects.create_user(username='moderator', password='pass12345')
+        with mock.patch('newsapp.tasks.process_news_image.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                news = News.objects.create(title='От пользователя', image_url='https://example.by/1.jpg')
+            delay.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                news.approve(user)
+        delay.assert_called_once_with(news.pk)
+
+    def test_internal_image_urls_rejected(self):
+        """Ссылки на внутреннюю сеть и не-http схемы не скачиваются, в том числе через редирект"""
+        self.resolved['intranet.example.by'] = '10.0.0.5'
+        urls = [
+            'file:///etc/passwd',
+            'http://127.0.0.1:6379/',
+            'http://169.254.169.254/latest/meta-data/',
+            'http://[::ffff:192.168.0.1]/a.jpg',
+            'https://intranet.example.by/a.jpg',
+        ]
+        with mock.patch('newsapp.images.requests.get') as get:
+            for url in urls:
+                with self.subTest(url=url), self.assertRaises(ValueError):
+                    load_image_bytes(url)
+        get.assert_not_called()
+
+        redirect = FakeImageResponse(b'', location='http://localhost/admin.jpg')
+        self.resolved['localhost'] = '127.0.0.1'
+        with mock.patch('newsapp.images.requests.get', return_value=redirect) as get:
+            with self.assertRaises(ValueError):
+                load_image_bytes('https://example.by/a.jpg')
+        get.assert_called_once()
+
+    def test_templates_emit_srcset_and_lazy_loading(self):
+        """Лента отдает picture со srcset и ленивой загрузкой, страница новости — без ленивой"""
+        news = News.objects.create(
+            title='С фото', content='Текст', moderation_status='approved',
+            image_url=self.save_bot_photo(make_image(1200, 800))
+        )
+        News.objects.create(
+            title='Еще не обработана', content='Текст', moderation_status='approved',
+            image_url='https://example.by/raw.jpg'
+        )
+        process_news_image.apply(args=[news.pk])
+
+        content = self.client.get(reverse('news')).content.decode()
+        self.assertIn('<source type="image/webp" srcset="/media/news_images/', content)
+        self.assertIn('960w', content)
+        self.assertIn('loading="lazy"', content)
+        self.assertIn('<img src="https://example.by/raw.jpg"', content)
+
+        content = self.client.get(reverse('news_detail', kwargs={'pk': news.pk})).content.decode()
+        self.assertIn('<picture', content)
+        self.assertIn('loading="eager"', content)
+
+    def test_changed_image_url_not_served_old_picture(self):
+        """После смены image_url старая картинка не отдается, даже если новая не обработалась"""
+        news = News.objects.create(
+            title='С фото', content='Текст', moderation_status='approved',
+            image_url=self.save_bot_photo(make_image(1200, 800))
+        )
+        process_news_image.apply(args=[news.pk])
+        news.refresh_from_db()
+        news.image_url = self.save_bot_photo(b'not an image', 'broken.jpg')
+        news.save()
+        process_news_image.apply(args=[news.pk])
+
+        content = self.client.get(reverse('news_detail', kwargs={'pk': news.pk})).content.decode()
+        self.assertNotIn('<picture', content)
+        self.assertIn('<img src="/media/news_photos/broken.jpg"', content)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+        self.alive = True
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise ConnectionError("chrome not reachable")
+        return 'about:blank'
+
+    def quit(self):
+        self.quit_called = True
+
+
+class BrowserPoolTest(TestCase):
+    def setUp(self):
+        self.drivers = []
+
+    def factory(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+    def test_browser_reused_between_pages(self):
+        """Браузер запускается один раз и переиспользуется"""
+        pool = BrowserPool(size=1, max_pages=10, factory=self.factory)
+        for _ in range(3):
+            with pool.browser() as driver:
+                self.assertIs(driver, self.drivers[0])
+        self.assertEqual(len(self.drivers), 1)
+
+    def test_browser_recycled_after_max_pages(self):
+        """После max_pages страниц браузер закрывается и запускается новый"""
+        pool = BrowserPool(size=1, max_pages=2, factory=self.factory)
+        for _ in range(3):
+            with pool.browser():
+                pass
+        self.assertEqual(len(self.drivers), 2)
+        self.assertTrue(self.drivers[0].quit_called)
+        self.assertFalse(self.drivers[1].quit_called)
+
+    def test_browser_recycled_after_error(self):
+        """Браузер с умершей сессией в пул не возвращается"""
+        pool = BrowserPool(size=1, max_pages=10, factory=self.factory)
+        with self.assertRaises(RuntimeError):
+            with pool.browser() as driver:
+                driver.alive = False
+                raise RuntimeError("chrome not reachable")
+        self.assertTrue(self.drivers[0].quit_called)
+        with pool.browser() as driver:
+            self.assertIs(driver, self.drivers[1])
+
+    def test_browser_kept_after_page_error(self):
+        """Таймаут ожидания элемента на странице не закрывает живой браузер"""
+        from selenium.common.exceptions import TimeoutException
+
+        pool = BrowserPool(size=1, max_pages=10, factory=self.factory)
+        with self.assertRaises(TimeoutException):
+            with pool.browser():
+                raise TimeoutException("news-header__image не найден")
+        self.assertFalse(self.drivers[0].quit_called)
+        with pool.browser() as driver:
+            self.assertIs(driver, self.drivers[0])
+        self.assertEqual(len(self.drivers), 1)
+
+    def test_pool_is_bounded(self):
+        """Больше size браузеров одновременно не запускается"""
+        pool = BrowserPool(size=1, max_pages=10, factory=self.factory)
+        with pool.browser():
+            with self.assertRaises(TimeoutError):
+                with pool.browser(timeout=0.05):
+                    pass
+        self.assertEqual(len(self.drivers), 1)
+
+    def test_close_quits_idle_browsers(self):
+        """close закрывает простаивающие браузеры"""
+        pool = BrowserPool(size=2, max_pages=10, factory=self.factory)
+        with pool.browser(), pool.browser():
+            pass
+        pool.close()
+        self.assertTrue(all(driver.quit_called for driver in self.drivers))
+
+
+class ViewCounterTest(TestCase):
+    def setUp(self):
+        get_client().delete(PENDING_KEY, FLUSHING_KEY)
+        self.news = News.objects.create(
+            title='Популярная новость',
+            content='Содержание',
+            moderation_status='approved',
+            views=10
+        )
+        self.other = News.objects.create(
+            title='Другая новость',
+            content='Содержание',
+            moderation_status='approved',
+            views=5
+        )
+
+    def tearDown(self):
+        get_client().delete(PENDING_KEY, FLUSHING_KEY)
+        cache.clear()
+
+    def view(self, news, client=None):
+        (client or Client()).get(reverse('news_detail', kwargs={'pk': news.pk}))
+
+    def test_views_buffered_until_flush(self):
+        """Просмотры не пишутся в БД до переноса"""
+        self.view(self.news)
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.views, 10)
+        self.assertEqual(NewsService.merge_pending_views([self.news])[0].views, 11)
+
+    def test_flush_writes_all_counters_at_once(self):
+        """Перенос записывает просмотры нескольких новостей и очищает буфер"""
+        for _ in range(3):
+            self.view(self.news)
+        self.view(self.other)
+        with self.assertNumQueries(3):
+            self.assertEqual(flush_views(), 2)
+        self.news.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.news.views, 13)
+        self.assertEqual(self.other.views, 6)
+        self.assertEqual(flush_views(), 0)
+
+    def test_session_dedup(self):
+        """Повторный просмотр в той же сессии не засчитывается"""
+        client = Client()
+        self.view(self.news, client)
+        self.view(self.news, client)
+        self.assertEqual(pending_views([self.news.pk]), {self.news.pk: 1})
+
+    def test_list_shows_pending_views(self):
+        """Лента показывает просмотры с учетом еще не перенесенных"""
+        self.view(self.news)
+        response = self.client.get(reverse('news'))
+        views = {news.pk: news.views for news in response.context['news']}
+        self.assertEqual(views[self.news.pk], 11)
+
+
+class ExplainNewsQueriesCommandTest(TestCase):
+    def test_command_prints_plans(self):
+        """Команда печатает планы для всех основных запросов"""
+        out = io.StringIO()
+        call_command('explain_news_queries', seed=50, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Лента главной', output)
+        self.assertIn('Проверка дублей', output)
+        self.assertEqual(News.objects.count(), 50)
+
+
+class SidebarTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Авто")
+        city = City.objects.create(name='Минск', latitude=53.9, longitude=27.56)
+        Weather.objects.create(city=city, temperature=4)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cold_cache_falls_back_to_db(self):
+        """При пустом кеше данные берутся из БД и публикуются"""
+        sidebar = NewsService.sidebar()
+        self.assertEqual(sidebar['t_avg'], 4)
+        self.assertEqual(sidebar['categories'], [self.category])
+        self.assertIsNone(sidebar['rate_usd'])
+        self.assertEqual(cache.get(AVG_TEMPERATURE_KEY), 4)
+
+    def test_warm_cache_needs_no_queries(self):
+        """С прогретым кешем виджеты не обращаются к БД"""
+        NewsService.publish_rates({'usd': 3.25, 'eur': 3.55, 'rub': 0.035})
+        NewsService.publish_avg_temperature()
+        NewsService.cache_categories()
+        with self.assertNumQueries(0):
+            sidebar = NewsService.sidebar()
+        self.assertEqual(sidebar['rate_eur'], 3.55)
+        self.assertEqual(sidebar['t_avg'], 4)
+
+    def test_category_change_refreshes_sidebar(self):
+        """Новая категория появляется в виджете"""
+        NewsService.cache_categories()
+        Category.objects.create(name="Спорт")
+        self.assertEqual(len(NewsService.sidebar()['categories']), 2)
+
+
 class CurrenciesViewTest(TestCase):
     def setUp(self):
         # Очищаем кэш
@@ -318,6 +1757,146 @@ class CurrenciesViewTest(TestCase):
         self.assertIsNone(response.context['rate_eur'])
         self.assertIsNone(response.context['rate_rub'])
 
+    def nbrb_payload(self, *codes):
+        rates = {'USD': (1, 3.25), 'EUR': (1, 3.55), 'RUB': (100, 3.5), 'PLN': (10, 8.1)}
+        return [
+            {'Cur_ID': i, 'Date': f'{timezone.localdate().isoformat()}T00:00:00', 'Cur_Abbreviation': code,
+             'Cur_Scale': rates[code][0], 'Cur_OfficialRate': rates[code][1]}
+            for i, code in enumerate(codes or rates)
+        ]
+
+    def test_to_byn_fetches_all_rates_in_one_request(self):
+        """Все курсы приходят одним запросом и сохраняются в БД"""
+        response = mock.Mock(status_code=200)
+        response.json.return_value = self.nbrb_payload()
+        with mock.patch('newsapp.tasks.requests.get', return_value=response) as get:
+            to_byn.apply()
+
+        get.assert_called_once_with(NBRB_RATES_URL, timeout=10)
+        self.assertEqual(NewsService.currency(), (3.25, 3.55, 3.5))
+        self.assertEqual(ExchangeRate.objects.get(currency='PLN').scale, 10)
+        self.assertEqual(ExchangeRate.objects.count(), 4)
+
+    def test_rates_survive_cache_flush(self):
+        """После сброса Redis виджет показывает последние сохраненные курсы"""
+        NewsService.save_rates(self.nbrb_payload())
+        cache.clear()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['rate_usd'], 3.25)
+        self.assertFalse(response.context['rates_stale'])
+        # Курсы из БД снова лежат в кеше
+        self.assertEqual(cache.get('ruble_to_byn_rate'), 3.5)
+
+    def test_old_rates_are_flagged_stale(self):
+        """Давно не обновлявшиеся курсы показываются с пометкой"""
+        NewsService.save_rates(self.nbrb_payload())
+        ExchangeRate.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=5))
+        cache.clear()
+
+        response = self.client.get(self.url)
+        self.assertTrue(response.context['rates_stale'])
+        self.assertContains(response, 'Свежие курсы пока не получены')
+
+    def test_incomplete_response_keeps_previous_rates(self):
+        """Если в ответе нет нужной валюты, прежние курсы не трогаются"""
+        with self.assertRaises(ValueError):
+            NewsService.save_rates(self.nbrb_payload('USD', 'EUR'))
+        self.assertFalse(ExchangeRate.objects.exists())
+        self.assertEqual(cache.get('dollar_to_byn_rate'), 3.25)
+
+    def test_rate_history_keeps_only_changes(self):
+        """История пополняется только изменившимися курсами, свертки дополняются"""
+        payload = self.nbrb_payload()
+        NewsService.save_rates(payload)
+        NewsService.save_rates(payload)
+        self.assertEqual(CurrencyRate.objects.count(), 4)
+        self.assertEqual(CurrencyRate.objects.get(currency='RUB').rate, 0.035)
+
+        payload[0]['Cur_OfficialRate'] = 3.3
+        NewsService.save_rates(payload)
+        self.assertEqual(CurrencyRate.objects.count(), 5)
+        day = CurrencyRollup.objects.get(currency='USD', period='day')
+        self.assertEqual((day.open, day.high, day.low, day.close, day.samples), (3.25, 3.3, 3.25, 3.3, 2))
+        self.assertEqual(CurrencyRollup.objects.get(currency='USD', period='week').close, 3.3)
+
+    def test_unchanged_rate_on_new_date_gets_day_rollup(self):
+        """Курс на новую дату попадает в дневные свертки, даже если он не изменился"""
+        payload = self.nbrb_payload()
+        NewsService.save_rates(payload)
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        for item in payload:
+            item['Date'] = f'{tomorrow.isoformat()}T00:00:00'
+        NewsService.save_rates(payload)
+        NewsService.save_rates(payload)
+
+        self.assertEqual(CurrencyRate.objects.filter(currency='USD').count(), 2)
+        days = CurrencyRollup.objects.filter(currency='USD', period='day').order_by('start')
+        self.assertEqual([(day.start, day.close) for day in days], [
+            (timezone.localdate(), 3.25), (tomorrow, 3.25)
+        ])
+        points = build_series(['USD'], today=tomorrow)[series_key('USD', '1m')]['points']
+        self.assertEqual(points, [[timezone.localdate().isoformat(), 3.25], [tomorrow.isoformat(), 3.25]])
+
+    @override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=0)
+    def test_currency_series_served_from_cache(self):
+        """Ряд для графика считается при получении курса и отдается без запросов к БД"""
+        NewsService.save_rates(self.nbrb_payload())
+        url = reverse('currency_series', args=['usd'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'range': '1y'})
+        self.assertEqual(response.json()['period'], 'week')
+        self.assertEqual(response.json()['points'][-1][1], 3.25)
+        self.assertEqual(self.client.get(url, {'range': '10y'}).status_code, 404)
+
+    @override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=0)
+    def test_currency_series_unknown_currency(self):
+        """Для неизвестной валюты 404, и ряды для нее в кеш не пишутся"""
+        NewsService.save_rates(self.nbrb_payload())
+        for currency in ('xyz', 'byn'):
+            response = self.client.get(reverse('currency_series', args=[currency]), {'range': '1m'})
+            self.assertEqual(response.status_code, 404)
+        self.assertIsNone(cache.get('currency_series:XYZ:1m'))
+
+    @override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=0)
+    def test_convert_endpoint(self):
+        """Конвертация идет по кросс-курсам с учетом Cur_Scale"""
+        NewsService.save_rates(self.nbrb_payload())
+        url = reverse('currency_convert')
+
+        response = self.client.get(url, {'amount': 100, 'from': 'usd', 'to': 'eur'})
+        self.assertEqual(response.json()['result'], round(100 * 3.25 / 3.55, 4))
+        self.assertEqual(self.client.get(url, {'amount': 10, 'from': 'PLN', 'to': 'BYN'}).json()['result'], 8.1)
+        self.assertEqual(self.client.get(url, {'amount': 1, 'from': 'BYN', 'to': 'RUB'}).json()['result'], 28.5714)
+        self.assertEqual(self.client.get(url, {'amount': 1, 'from': 'USD', 'to': 'XXX'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'amount': 'nan', 'from': 'USD', 'to': 'EUR'}).status_code, 400)
+
+    def test_conversions_use_process_copy(self):
+        """Повторные конвертации не ходят ни в Redis, ни в БД, а новые курсы подхватываются"""
+        payload = self.nbrb_payload()
+        NewsService.save_rates(payload)
+        with override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=0):
+            NewsService.convert(1, 'USD', 'BYN')
+
+        with override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=60), self.assertNumQueries(0), \
+                mock.patch('newsapp.currency.cache') as redis_cache:
+            for _ in range(100):
+                NewsService.convert(1, 'EUR', 'USD')
+        redis_cache.get.assert_not_called()
+        redis_cache.get_many.assert_not_called()
+
+        payload[0]['Cur_OfficialRate'] = 3.3
+        NewsService.save_rates(payload)
+        with override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=0):
+            self.assertEqual(NewsService.convert(1, 'USD', 'BYN'), 3.3)
+
+    @override_settings(NEWS_RATES_MATRIX_CHECK_INTERVAL=0)
+    def test_convert_after_cache_flush(self):
+        """После сброса Redis кросс-курсы собираются из сохраненных курсов"""
+        NewsService.save_rates(self.nbrb_payload())
+        cache.clear()
+        self.assertAlmostEqual(NewsService.convert(2, 'USD', 'BYN'), 6.5)
+
 
 class NewsDetailUnitTests(TestCase):
 
@@ -339,6 +1918,8 @@ class NewsDetailUnitTests(TestCase):
         self.url = reverse('news_detail', kwargs={'pk': self.news.pk})
         self.client = Client()
 
+    def tearDown(self):
+        get_client().delete(PENDING_KEY, FLUSHING_KEY)
 
     def test_view_returns_200_for_existing_news(self):
         """GET запрос возвращает 200 для существующей новости"""
@@ -354,16 +1935,19 @@ class NewsDetailUnitTests(TestCase):
         """Счетчик просмотров увеличивается при первом просмотре"""
         initial_views = self.news.views
         self.client.get(self.url)
+        flush_views()
         self.news.refresh_from_db()
         self.assertEqual(self.news.views, initial_views + 1)
 
     def test_view_does_not_increment_views_on_repeated_views(self):
         """Счетчик не увеличивается при повторном просмотре в той же сессии"""
         self.client.get(self.url)  # Первый просмотр
+        flush_views()
         self.news.refresh_from_db()
         first_count = self.news.views
 
         self.client.get(self.url)  # Второй просмотр (та же сессия)
+        flush_views()
         self.news.refresh_from_db()
         self.assertEqual(self.news.views, first_count)  # Не изменился
 
@@ -378,7 +1962,7 @@ class NewsDetailUnitTests(TestCase):
 
         response = self.client.get(self.url)
         self.assertIn('comments', response.context)
-        self.assertEqual(response.context['comments'].count(), 1)
+        self.assertEqual(len(response.context['comments']), 1)
 
     def test_view_returns_form_in_context(self):
         """Форма комментариев передается в контексте"""
@@ -386,6 +1970,92 @@ class NewsDetailUnitTests(TestCase):
         self.assertIn('form', response.context)
         self.assertEqual(response.context['form'].__class__.__name__, 'CommentsForm')
 
+class CommentsPaginationTest(TestCase):
+    def setUp(self):
+        self.news = News.objects.create(
+            title='Обсуждаемая новость',
+            content='Содержание',
+            moderation_status='approved'
+        )
+        now = timezone.now()
+        for i in range(45):
+            Comments.objects.create(
+                news=self.news,
+                author='commenter',
+                comments=f'Комментарий {i}',
+                date_created=now - datetime.timedelta(minutes=i)
+            )
+        self.url = reverse('news_detail', kwargs={'pk': self.news.pk})
+
+    def tearDown(self):
+        cache.clear()
+        get_client().delete(PENDING_KEY, FLUSHING_KEY)
+
+    def test_comments_count_maintained(self):
+        """Счетчик комментариев растет при добавлении и уменьшается при удалении"""
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.comments_count, 45)
+        Comments.objects.filter(comments='Комментарий 0').delete()
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.comments_count, 44)
+
+    def test_news_save_keeps_comments_count(self):
+        """Сохранение устаревшего объекта новости не затирает счетчик"""
+        stale = News.objects.get(pk=self.news.pk)
+        Comments.objects.create(news=self.news, comments='Еще один')
+        stale.title = 'Новый заголовок'
+        stale.save()
+        self.news.refresh_from_db()
+        self.assertEqual(self.news.comments_count, 46)
+
+    def test_admin_shows_counters_read_only(self):
+        """Счетчики в админке только для чтения: правка формы их не затирает и не теряется молча"""
+        self.client.force_login(User.objects.create_superuser(username='admin', password='adminpass123'))
+        response = self.client.get(reverse('admin:newsapp_news_change', args=[self.news.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('views', response.context['adminform'].form.fields)
+        self.assertContains(response, 'field-views')
+        self.assertContains(response, 'field-comments_count')
+
+    def test_detail_shows_first_page(self):
+        """На странице новости только первая порция комментариев"""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].comments, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'Комментарии (45)')
+
+    def test_load_more_endpoint(self):
+        """Эндпоинт отдает следующие порции до конца"""
+        response = self.client.get(self.url)
+        cursor = response.context['comments'].next_cursor
+        texts = []
+        while cursor:
+            data = self.client.get(
+                reverse('news_comments', kwargs={'pk': self.news.pk}), {'cursor': cursor}
+            ).json()
+            texts += [comment['comments'] for comment in data['comments']]
+            cursor = data['next_cursor']
+        self.assertEqual(texts, [f'Комментарий {i}' for i in range(20, 45)])
+
+    def test_load_more_for_missing_news(self):
+        """Для несуществующей новости эндпоинт отвечает 404, как и страница новости"""
+        missing = self.news.pk + 1000
+        self.assertEqual(self.client.get(reverse('news_comments', kwargs={'pk': missing})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('news_detail', kwargs={'pk': missing})).status_code, 404)
+
+    def test_detail_query_count_does_not_grow(self):
+        """Число запросов страницы новости не зависит от числа комментариев"""
+        with CaptureQueriesContext(connection) as before:
+            Client().get(self.url)
+        for i in range(50):
+            Comments.objects.create(news=self.news, comments=f'Новый {i}')
+        with CaptureQueriesContext(connection) as after:
+            Client().get(self.url)
+        self.assertEqual(len(before), len(after))
+
+
 class AddNewsViewUnitTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
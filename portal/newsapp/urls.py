@@ -1,8 +1,14 @@
 from django.urls import path
-from .views import news_view, news_detail, add_news_view
+from .views import (
+    news_view, news_detail, add_news_view, news_autocomplete, news_comments, currency_series, currency_convert
+)
 
 urlpatterns = [
     path('', news_view, name='news'),
     path('news/<int:pk>/', news_detail, name='news_detail'),
+    path('news/<int:pk>/comments/', news_comments, name='news_comments'),
+    path('news/autocomplete/', news_autocomplete, name='news_autocomplete'),
+    path('currencies/<str:currency>/series/', currency_series, name='currency_series'),
+    path('currencies/convert/', currency_convert, name='currency_convert'),
     path('addNews/', add_news_view, name='addNews')
 ]
\ No newline at end of file
@@ -0,0 +1,84 @@
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import News
+
+logger = logging.getLogger('app')
+
+# Хэш news_id -> число просмотров, еще не записанных в News.views
+PENDING_KEY = 'news_views:pending'
+# Хэш, который сейчас переносится в БД задачей flush_news_views
+FLUSHING_KEY = 'news_views:flushing'
+FLUSH_LOCK_KEY = 'news_views:flush_lock'
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.NEWS_VIEWS_REDIS_URL, decode_responses=True)
+    return _client
+
+
+def seen_key(session_key, news_id):
+    return f'news_views:seen:{session_key}:{news_id}'
+
+
+def register_view(news_id, session_key):
+    """
+    Засчитывает просмотр в Redis, если в этой сессии новость еще не смотрели.
+    В БД счетчик попадает позже, пачкой, через flush_views
+    """
+    client = get_client()
+    if not client.set(seen_key(session_key, news_id), 1, nx=True, ex=settings.NEWS_VIEWS_DEDUP_TTL):
+        return False
+    client.hincrby(PENDING_KEY, news_id, 1)
+    return True
+
+
+def pending_views(news_ids):
+    news_ids = [str(news_id) for news_id in news_ids]
+    if not news_ids:
+        return {}
+    pipe = get_client().pipeline(transaction=False)
+    pipe.hmget(PENDING_KEY, news_ids)
+    pipe.hmget(FLUSHING_KEY, news_ids)
+    pending, flushing = pipe.execute()
+    return {
+        int(news_id): int(p or 0) + int(f or 0)
+        for news_id, p, f in zip(news_ids, pending, flushing)
+        if p or f
+    }
+
+
+def flush_views():
+    """Переносит накопленные просмотры в News.views одним UPDATE, возвращает число новостей"""
+    client = get_client()
+    lock = client.lock(FLUSH_LOCK_KEY, timeout=60, blocking=False)
+    if not lock.acquire():
+        return 0
+    try:
+        # Если прошлый перенос упал, сначала дописываем его хэш
+        if not client.exists(FLUSHING_KEY):
+            if not client.exists(PENDING_KEY):
+                return 0
+            client.rename(PENDING_KEY, FLUSHING_KEY)
+
+        deltas = {int(news_id): int(delta) for news_id, delta in client.hgetall(FLUSHING_KEY).items()}
+        if deltas:
+            with transaction.atomic():
+                News.objects.filter(pk__in=deltas).update(views=F('views') + Case(
+                    *[When(pk=news_id, then=Value(delta)) for news_id, delta in deltas.items()],
+                    default=Value(0),
+                    output_field=IntegerField()
+                ))
+        client.delete(FLUSHING_KEY)
+        logger.info(f"Просмотры записаны в БД для {len(deltas)} новостей")
+        return len(deltas)
+    finally:
+        lock.release()
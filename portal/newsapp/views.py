@@ -1,42 +1,63 @@
+import math
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import Http404
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .conditional import detail_etag, detail_last_modified, list_etag, list_last_modified
 from .forms import NewsForm, CommentsForm
-from .models import Category, Comments, News
+from .models import News
+from .page_cache import LIST_VERSION_KEY, detail_version_key, versioned_cache_page
 from .services import NewsService
 
-cache_page(60)
+COMMENTS_PER_PAGE = 20
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
+@versioned_cache_page('list', lambda **kwargs: [LIST_VERSION_KEY])
 def news_view(request):
     category_id = request.GET.get('category')
     query = request.GET.get('q', '').strip()
     page_number = request.GET.get('page', 1)
     news = NewsService.get_news(category_id=category_id, query=query)
-    page_obj, paginator = NewsService.get_paginated_news(
-        news=news,
-        page_number=page_number,
-        per_page=12
-    )
-    rate_usd, rate_eur, rate_rub = NewsService.currency()
-    t = NewsService.avg_temperature()
+    if settings.NEWS_PAGINATION == 'keyset' and not query:
+        page_obj = NewsService.get_keyset_page(
+            news=news,
+            cursor=request.GET.get('cursor'),
+            per_page=12,
+            with_total=settings.NEWS_PAGINATION_APPROX_TOTAL
+        )
+    else:
+        page_obj, paginator = NewsService.get_paginated_news(
+            news=news,
+            page_number=page_number,
+            per_page=12
+        )
+    NewsService.merge_pending_views(page_obj)
     return render(request, 'news.html', {
         'news': page_obj,
-        'categories': Category.objects.all(),
         'selected_category': request.GET.get('category'),
-        'rate_usd': rate_usd,
-        'rate_eur': rate_eur,
-        'rate_rub': rate_rub,
-        't_avg': t['t_avg']
+        'query': query,
+        **NewsService.sidebar()
     })
 
-cache_page(60)
+def news_autocomplete(request):
+    results = NewsService.autocomplete(request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [
+            {'id': item['id'], 'title': item['title'], 'url': reverse('news_detail', args=[item['id']])}
+            for item in results
+        ]
+    })
+
+@cache_control(no_cache=True)
 def news_detail(request, pk):
-    try:
-        news = NewsService.get_news_by_id(pk)
-    except News.DoesNotExist:
-        raise Http404("Новость не найдена")
-    comments = Comments.objects.filter(news=news).order_by('-date_created')
     if request.method == 'POST':
+        news = get_news_or_404(pk)
         form = CommentsForm(request.POST)
         if form.is_valid():
             comments = form.save(commit=False)
@@ -44,17 +65,81 @@ def news_detail(request, pk):
             comments.news = news
             comments.save()
             return redirect('news_detail', pk=pk)
+        response = render_news_detail(request, news, form)
     else:
-        form = CommentsForm()
+        response = news_detail_page(request, pk=pk)
 
+    # Просмотр засчитываем и тогда, когда страница отдана из кеша
     NewsService.increment_views(pk, request)
+    return response
+
 
+@condition(etag_func=detail_etag, last_modified_func=detail_last_modified)
+@versioned_cache_page('detail', lambda pk: [detail_version_key(pk)])
+def news_detail_page(request, pk):
+    return render_news_detail(request, get_news_or_404(pk), CommentsForm())
+
+
+def get_news_or_404(pk):
+    try:
+        return NewsService.get_news_by_id(pk)
+    except News.DoesNotExist:
+        raise Http404("Новость не найдена")
+
+
+def render_news_detail(request, news, form):
+    comments = NewsService.get_comments_page(news.pk, per_page=COMMENTS_PER_PAGE)
     return render(request, 'news_detail.html', {
         'news': news,
         'form': form,
         'comments': comments
     })
 
+@cache_control(max_age=600)
+def currency_series(request, currency):
+    # Ряд уже посчитан по сверткам при получении курса и лежит в кеше
+    series = NewsService.currency_series(currency, request.GET.get('range', '1m'))
+    if series is None:
+        raise Http404("Неизвестная валюта или диапазон")
+    return JsonResponse(series)
+
+def currency_convert(request):
+    # Кросс-курсы берутся из памяти процесса, без обращений к Redis и БД
+    try:
+        amount = float(request.GET.get('amount', 1))
+        if not math.isfinite(amount):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Некорректная сумма'}, status=400)
+    source, target = request.GET.get('from', ''), request.GET.get('to', '')
+    try:
+        result = NewsService.convert(amount, source, target)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'amount': amount,
+        'from': source.upper(),
+        'to': target.upper(),
+        'result': round(result, 4),
+    })
+
+def news_comments(request, pk):
+    # Догрузка комментариев кнопкой "Показать еще" на странице новости
+    if not News.objects.filter(pk=pk).exists():
+        raise Http404("Новость не найдена")
+    page = NewsService.get_comments_page(pk, cursor=request.GET.get('cursor'), per_page=COMMENTS_PER_PAGE)
+    return JsonResponse({
+        'comments': [
+            {
+                'author': comment.author,
+                'comments': comment.comments,
+                'date_created': comment.date_created.isoformat(),
+            }
+            for comment in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
 @login_required(login_url='/register/login/')
 def add_news_view(request):
     if request.method == 'POST':
@@ -15,9 +15,14 @@ app.conf.beat_schedule = {
         'task': 'newsapp.tasks.to_byn',
         'schedule': 600
     },
-    'parsing-every-thirty-minutes':{
-        'task': 'newsapp.tasks.news_pars',
-        'schedule': 1800
+    # Сам планировщик легкий: раздает воркерам только источники, которым подошел poll_interval
+    'schedule-news-sources-every-minute': {
+        'task': 'newsapp.tasks.schedule_news_sources',
+        'schedule': 60
+    },
+    'flush-news-views-every-minute': {
+        'task': 'newsapp.tasks.flush_news_views',
+        'schedule': 60
     },
     'weather-every-hour': {
         'task': 'weatherapp.tasks.fetch_weather',
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
     'register',
     'newsapp',
@@ -153,6 +154,81 @@ CACHES = {
     }
 }
 
+# Время жизни закешированных страниц ленты и новости (сек). Кеш сбрасывается
+# раньше, как только новость одобрена, изменена или прокомментирована
+NEWS_PAGE_CACHE_TIMEOUT = 60
+
+# Поиск новостей: 'postgres' — полнотекстовый поиск по search_vector (GIN),
+# 'icontains' — старый поиск через LIKE по заголовку и тексту
+NEWS_SEARCH_BACKEND = os.environ.get('NEWS_SEARCH_BACKEND', 'postgres')
+
+# Автодополнение заголовков в строке поиска (триграммы pg_trgm)
+NEWS_AUTOCOMPLETE_MIN_LENGTH = 2
+NEWS_AUTOCOMPLETE_LIMIT = 8
+# Сколько совпадений из индекса ранжировать по похожести
+NEWS_AUTOCOMPLETE_CANDIDATES = 200
+NEWS_AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+# Пагинация ленты: 'keyset' — по курсору (date_created, id) без COUNT(*) и OFFSET,
+# 'page' — классический Paginator с номерами страниц. Результаты поиска
+# сортируются по релевантности и всегда используют Paginator
+NEWS_PAGINATION = os.environ.get('NEWS_PAGINATION', 'keyset')
+# Показывать в keyset-режиме примерное число новостей (оценка планировщика)
+NEWS_PAGINATION_APPROX_TOTAL = True
+
+# Просмотры новостей копятся в Redis (отдельная база, чтобы не терялись при очистке кеша)
+# и раз в минуту переносятся в News.views задачей flush_news_views
+NEWS_VIEWS_REDIS_URL = 'redis://127.0.0.1:6379/2'
+# Сколько секунд повторный просмотр в той же сессии не засчитывается
+NEWS_VIEWS_DEDUP_TTL = 600
+
+# Пул headless-браузеров для источников, которым нужен JS. Пул свой у каждого
+# процесса воркера: не больше NEWS_BROWSER_POOL_SIZE браузеров, каждый
+# пересоздается после NEWS_BROWSER_MAX_PAGES страниц
+NEWS_BROWSER_POOL_SIZE = 1
+NEWS_BROWSER_MAX_PAGES = 50
+# Сколько секунд ждать свободный браузер и нужный элемент на странице
+NEWS_BROWSER_ACQUIRE_TIMEOUT = 60
+NEWS_BROWSER_WAIT_TIMEOUT = 10
+
+# Сколько источников парсится одновременно
+NEWS_SCRAPER_CONCURRENCY = 5
+# Первая задержка (сек) перед повтором упавшего источника, дальше она удваивается
+NEWS_SCRAPER_RETRY_DELAY = 10
+# Сколько ссылок с ленты источника проверять за запуск
+NEWS_SCRAPER_MAX_ARTICLES = 50
+# Сколько хранить ETag, Last-Modified и хэш скачанных страниц для условных запросов
+NEWS_SCRAPER_PAGE_STATE_TIMEOUT = 60 * 60 * 24 * 7
+# Сколько не скачивать заново статью, которая не разобралась или ответила 4xx
+NEWS_SCRAPER_BROKEN_TIMEOUT = 60 * 60 * 24
+# Адаптивный опрос источников: сколько новых статей в среднем должно набираться
+# к следующему опросу и вес последнего опроса в скользящей частоте публикаций
+NEWS_POLL_TARGET_ITEMS = 1
+NEWS_POLL_RATE_SMOOTHING = 0.3
+
+# Курсы валют старше этого (сек) виджет показывает с пометкой об устаревании
+NEWS_RATES_STALE_AFTER = 60 * 60
+# Ряды курсов для графиков пересчитываются при новом курсе; столько (сек) живут без него
+NEWS_RATES_SERIES_TIMEOUT = 60 * 60 * 24
+# Как часто (сек) процесс сверяет свою таблицу кросс-курсов с версией в Redis
+NEWS_RATES_MATRIX_CHECK_INTERVAL = 5
+
+# Сколько городов запрашивать у Open-Meteo одним запросом
+WEATHER_BATCH_SIZE = 100
+# Код погоды для кодов, которых нет в справочнике Weather_codes (None — "Нет данных")
+WEATHER_FALLBACK_CODE = None
+
+# Картинки новостей пережимаются в WebP и JPEG этих ширин (px) для srcset
+NEWS_IMAGE_WIDTHS = (320, 640, 960)
+NEWS_IMAGE_QUALITY = 80
+# Картинки больше этого размера (байт) не скачиваются
+NEWS_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+# Почти-дубли: оценка похожести текстов по MinHash, выше которой новость считается
+# дублем, и минимальная длина текста (слов), с которой тексты вообще сравниваются
+NEWS_DUPLICATE_THRESHOLD = 0.8
+NEWS_DUPLICATE_MIN_WORDS = 20
+
 
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
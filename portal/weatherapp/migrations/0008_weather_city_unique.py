@@ -0,0 +1,26 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:02
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_weather(apps, schema_editor):
+    # Перед ограничением оставляем у каждого города только последнюю запись
+    Weather = apps.get_model('weatherapp', 'Weather')
+    latest = Weather.objects.filter(city__isnull=False).values('city').annotate(last_id=Max('id')).values('last_id')
+    Weather.objects.filter(city__isnull=False).exclude(id__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherapp', '0007_remove_weather_weathercode2_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_weather, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='weather',
+            constraint=models.UniqueConstraint(fields=('city',), name='weather_city_unique'),
+        ),
+    ]
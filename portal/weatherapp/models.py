@@ -40,5 +40,8 @@ class Weather(models.Model):
         blank=True
     )
 
-
-
+    class Meta:
+        constraints = [
+            # Одна строка текущей погоды на город: по нему идет bulk upsert в fetch_weather
+            models.UniqueConstraint(fields=['city'], name='weather_city_unique'),
+        ]
@@ -1,57 +1,83 @@
 from celery import shared_task
 import logging
 import requests
+from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
 
+from newsapp.services import NewsService
 from .models import City, Weather, Weather_codes
 
 logger = logging.getLogger('weather')
 
-@shared_task(bind=True, max_retries=5, default_retry_delay=10)
-def fetch_weather(self):
-    logger.info("Запуск задачи погоды")
-    cities = City.objects.all()
-    for city in cities:
-        try:
-            url = f"https://api.open-meteo.com/v1/forecast?latitude={city.latitude}&longitude={city.longitude}&current_weather=true"
+OPEN_METEO_URL = 'https://api.open-meteo.com/v1/forecast'
 
-            logger.debug(f"Запрос погоды для города {city.name}: {url}")
 
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()  # Проверка статуса ответа
+def fetch_current_weather(cities):
+    """
+    Текущая погода для пачки городов одним запросом: Open-Meteo принимает списки
+    координат через запятую и отвечает в том же порядке
+    """
+    latitudes = ','.join(str(city.latitude) for city in cities)
+    longitudes = ','.join(str(city.longitude) for city in cities)
+    url = f"{OPEN_METEO_URL}?latitude={latitudes}&longitude={longitudes}&current_weather=true"
 
-            data = response.json()
-            weather = data.get('current_weather')
+    logger.debug(f"Запрос погоды для {len(cities)} городов: {url}")
 
-            if weather is None:
-                logger.warning(f"Данные о текущей погоде не найдены для города {city.name}")
-                continue  # Пропускаем этот город и переходим к следующему
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()  # Проверка статуса ответа
 
-            # Извлечение данных из ответа API
-            temperature = weather.get('temperature')
-            windspeed = weather.get('windspeed')
-            winddirection = weather.get('winddirection')
-            weather_code_value = weather.get('weathercode')
-            weather_code_obj = Weather_codes.objects.get(code=weather_code_value)
-            try:
-                existing, created = Weather.objects.update_or_create(
-                    city=city,
-                    defaults={
-                        'city': city,
-                        'temperature': temperature,
-                        'windspeed': windspeed,
-                        'winddirection': winddirection,
-                        'weathercode': weather_code_obj,
-                        'date_updated': timezone.now()
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Ошибка при сохранении новости в БД: {e}", exc_info=True)
-                raise
-            logger.info(f"Погода успешно обновлена: {weather}")
+    data = response.json()
+    # На одну точку Open-Meteo отвечает объектом, на несколько — списком
+    if isinstance(data, dict):
+        data = [data]
+    if len(data) != len(cities):
+        raise ValueError(f"Open-Meteo вернул {len(data)} точек вместо {len(cities)}")
+    return [item.get('current_weather') for item in data]
 
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def fetch_weather(self):
+    logger.info("Запуск задачи погоды")
+    cities = list(City.objects.all())
+    # Справочник кодов читаем один раз за запуск; Weather ссылается на сам код
+    known_codes = set(Weather_codes.objects.values_list('code', flat=True))
+    batch_size = settings.WEATHER_BATCH_SIZE
+    rows = []
+    for start in range(0, len(cities), batch_size):
+        batch = cities[start:start + batch_size]
+        try:
+            current = fetch_current_weather(batch)
         except Exception as e:
             logger.error(f"Ошибка: {e}")
             raise self.retry(exc=e)
+        for city, weather in zip(batch, current):
+            if weather is None:
+                logger.warning(f"Данные о текущей погоде не найдены для города {city.name}")
+                continue  # Пропускаем этот город и переходим к следующему
+
+            weather_code = weather.get('weathercode')
+            if weather_code not in known_codes:
+                # Неизвестный код не должен срывать обновление остальных городов
+                logger.warning(f"Неизвестный код погоды {weather_code} для города {city.name}")
+                weather_code = settings.WEATHER_FALLBACK_CODE
+            rows.append(Weather(
+                city=city,
+                temperature=weather.get('temperature'),
+                windspeed=weather.get('windspeed'),
+                winddirection=weather.get('winddirection'),
+                weathercode_id=weather_code,
+                date_updated=timezone.now(),
+            ))
+
+    # Все города одним upsert по ограничению weather_city_unique
+    Weather.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['city'],
+        update_fields=['temperature', 'windspeed', 'winddirection', 'weathercode', 'date_updated']
+    )
+    logger.info(f"Погода успешно обновлена для {len(rows)} городов")
 
+    # Средняя температура для виджета главной считается один раз после обновления
+    NewsService.publish_avg_temperature()
@@ -1,3 +1,64 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .models import City, Weather, Weather_codes
+from .tasks import fetch_current_weather, fetch_weather
+
+
+def open_meteo_point(temperature, code=0):
+    return {'current_weather': {'temperature': temperature, 'windspeed': 3.5, 'winddirection': 180, 'weathercode': code}}
+
+
+def fake_response(data):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = data
+    return response
+
+
+class FetchWeatherTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Weather_codes.objects.create(code=0, description='Ясно')
+        self.cities = [
+            City.objects.create(name='Минск', latitude='53.904539', longitude='27.561523'),
+            City.objects.create(name='Гомель', latitude='52.434500', longitude='30.975400'),
+            City.objects.create(name='Брест', latitude='52.097500', longitude='23.687700'),
+        ]
+
+    @override_settings(WEATHER_BATCH_SIZE=2)
+    def test_cities_are_fetched_in_batches(self):
+        """Города запрашиваются пачками, ответы раскладываются по своим городам"""
+        responses = [
+            fake_response([open_meteo_point(5), open_meteo_point(7)]),
+            # На одну точку Open-Meteo отвечает объектом, а не списком
+            fake_response(open_meteo_point(9)),
+        ]
+        with mock.patch('weatherapp.tasks.requests.get', side_effect=responses) as get:
+            fetch_weather.apply()
+
+        self.assertEqual(get.call_count, 2)
+        self.assertIn('latitude=53.904539,52.434500&longitude=27.561523,30.975400', get.call_args_list[0].args[0])
+        temperatures = dict(Weather.objects.values_list('city__name', 'temperature'))
+        self.assertEqual(temperatures, {'Минск': 5, 'Гомель': 7, 'Брест': 9})
+
+    def test_point_count_mismatch_is_an_error(self):
+        """Ответ с другим числом точек нельзя сопоставить с городами"""
+        with mock.patch('weatherapp.tasks.requests.get', return_value=fake_response([open_meteo_point(5)])):
+            with self.assertRaises(ValueError):
+                fetch_current_weather(self.cities)
+
+    def test_unknown_code_and_existing_rows(self):
+        """Неизвестный код не срывает обновление, существующие строки обновляются одним upsert"""
+        Weather.objects.create(city=self.cities[0], temperature=-3, weathercode_id=0)
+        points = [open_meteo_point(5), open_meteo_point(7, code=99), open_meteo_point(9)]
+        with mock.patch('weatherapp.tasks.requests.get', return_value=fake_response(points)), \
+                self.assertNumQueries(4):
+            # Города, коды, upsert и средняя температура для виджета
+            fetch_weather.apply()
+
+        self.assertEqual(Weather.objects.count(), 3)
+        minsk = Weather.objects.get(city=self.cities[0])
+        self.assertEqual((minsk.temperature, minsk.weathercode_id), (5, 0))
+        self.assertIsNone(Weather.objects.get(city=self.cities[1]).weathercode_id)